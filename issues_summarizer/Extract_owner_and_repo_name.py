@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
 import streamlit as st
-import requests
+
+from fetching_issues import github_tokens
+from github_issues import GitHubError, fetch_repo_creation_date
 
 def get_owner_repo_from_url(repo_url):
     parsed_url = urlparse(repo_url)
@@ -16,15 +18,10 @@ def get_owner_repo_from_url(repo_url):
 
 def get_repo_creation_date(owner, repo):
     try:
-        url = f"https://api.github.com/repos/{owner}/{repo}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            repo_data = response.json()
-            creation_date = datetime.strptime(repo_data['created_at'], "%Y-%m-%dT%H:%M:%SZ")
-            return creation_date
-        else:
-            st.error("Failed to fetch repository creation date.")
-            return None
+        return fetch_repo_creation_date(owner, repo, github_tokens(), wait=False)
+    except GitHubError:
+        st.error("Failed to fetch repository creation date.")
+        return None
     except Exception as e:
         st.error(f"Error fetching repository creation date: {e}")
         return None
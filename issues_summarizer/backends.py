@@ -0,0 +1,229 @@
+import os
+import json
+import logging
+import threading
+import time
+from typing import Any, Iterator, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from pydantic import PrivateAttr
+
+from metrics import set_gauge
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "16"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("MODEL_HEALTH_CHECK_INTERVAL", "15"))
+REQUEST_TIMEOUT = float(os.getenv("MODEL_REQUEST_TIMEOUT", "600"))
+# How long Ollama keeps a model in memory after a request; a negative duration such as "-1m"
+# keeps it until it is unloaded
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_urls(name, default=None):
+    """Comma-separated base URLs from the environment."""
+    urls = [url.strip().rstrip("/") for url in os.getenv(name, "").split(",") if url.strip()]
+    return urls or ([default] if default else [])
+
+
+def ollama_urls():
+    """Ollama base URLs from OLLAMA_URLS, else the single OLLAMA_URL (which may name /api/generate)."""
+    single = os.getenv("OLLAMA_URL", DEFAULT_OLLAMA_URL).rstrip("/")
+    return endpoint_urls("OLLAMA_URLS", single.split("/api/")[0])
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """One pooled session for every model endpoint, so each request reuses a warm connection."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+class PooledOllama(LLM):
+    """Ollama completion client on the shared pooled session.
+
+    LangChain's Ollama wrapper opens a new connection for every call.
+    """
+
+    model: str
+    base_url: str = DEFAULT_OLLAMA_URL
+    keep_alive: str = KEEP_ALIVE
+
+    @property
+    def _llm_type(self):
+        return "pooled-ollama"
+
+    @property
+    def health_url(self):
+        return f"{self.base_url}/api/tags"
+
+    def load(self):
+        """Loads the model into memory without generating anything."""
+        payload = {"model": self.model, "keep_alive": self.keep_alive}
+        get_session().post(f"{self.base_url}/api/generate", json=payload, timeout=REQUEST_TIMEOUT).raise_for_status()
+
+    def unload(self):
+        """Frees the model's memory right away instead of when keep_alive runs out."""
+        payload = {"model": self.model, "keep_alive": 0}
+        get_session().post(f"{self.base_url}/api/generate", json=payload, timeout=30).raise_for_status()
+
+    def is_loaded(self):
+        response = get_session().get(f"{self.base_url}/api/ps", timeout=5)
+        response.raise_for_status()
+        # /api/ps names models with their tag, and an untagged name means :latest
+        name = self.model if ":" in self.model else f"{self.model}:latest"
+        return any(model.get("name") == name for model in response.json().get("models", []))
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs) -> Iterator[GenerationChunk]:
+        payload = {"model": self.model, "prompt": prompt, "stream": True, "options": {"stop": stop},
+                   "keep_alive": self.keep_alive, **kwargs}
+        with get_session().post(f"{self.base_url}/api/generate", json=payload, stream=True,
+                                timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise ValueError(f"Ollama error: {data['error']}")
+                chunk = GenerationChunk(text=data.get("response", ""))
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+
+class Endpoint:
+    """One backend serving a logical model, with the work currently routed to it."""
+
+    def __init__(self, llm, health_url=None, headers=None):
+        self.llm = llm
+        self.health_url = health_url
+        self.headers = headers or {}
+        self.outstanding = 0
+        self.healthy = True
+
+    def check(self):
+        if not self.health_url:
+            return True
+        try:
+            return get_session().get(self.health_url, headers=self.headers, timeout=5).ok
+        except requests.RequestException:
+            return False
+
+
+class ModelRouter(LLM):
+    """Spreads requests for one logical model over several endpoints by least outstanding work.
+
+    A request that fails before producing output marks its endpoint unhealthy and moves on to
+    the next one; a background thread probes endpoints and brings recovered ones back.
+    """
+
+    name: str = "router"
+    _endpoints: List[Endpoint] = PrivateAttr()
+    _lock: Any = PrivateAttr()
+
+    def __init__(self, endpoints, **kwargs):
+        super().__init__(**kwargs)
+        self._endpoints = list(endpoints)
+        self._lock = threading.Lock()
+        if len(self._endpoints) > 1:
+            threading.Thread(target=self._health_loop, name=f"health-{self.name}", daemon=True).start()
+
+    @property
+    def _llm_type(self):
+        return "model-router"
+
+    @property
+    def endpoints(self):
+        return list(self._endpoints)
+
+    def _health_loop(self):
+        while True:
+            time.sleep(HEALTH_CHECK_INTERVAL)
+            for endpoint in self._endpoints:
+                healthy = endpoint.check()
+                if healthy != endpoint.healthy:
+                    logger.warning("Model endpoint %s is %s", endpoint.health_url, "back" if healthy else "down")
+                endpoint.healthy = healthy
+                set_gauge("llm_endpoint_healthy", int(healthy), endpoint=endpoint.health_url)
+
+    def _acquire(self, tried):
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints if endpoint not in tried]
+            if not candidates:
+                return None
+            # Dead endpoints are only used when nothing healthy is left to try
+            endpoint = min(candidates, key=lambda endpoint: (not endpoint.healthy, endpoint.outstanding))
+            endpoint.outstanding += 1
+            set_gauge("llm_endpoint_outstanding", endpoint.outstanding, endpoint=endpoint.health_url)
+            return endpoint
+
+    def _release(self, endpoint):
+        with self._lock:
+            endpoint.outstanding -= 1
+            set_gauge("llm_endpoint_outstanding", endpoint.outstanding, endpoint=endpoint.health_url)
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs) -> Iterator[GenerationChunk]:
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise last_error or ValueError(f"No endpoints configured for {self.name}")
+            tried.append(endpoint)
+            started = False
+            try:
+                for chunk in endpoint.llm._stream(prompt, stop, run_manager, **kwargs):
+                    started = True
+                    yield chunk
+                endpoint.healthy = True
+                return
+            except Exception as e:
+                # Once output has been streamed the request can't be replayed elsewhere
+                if started:
+                    raise
+                logger.warning("Model endpoint %s failed: %s", endpoint.health_url, e)
+                endpoint.healthy = False
+                set_gauge("llm_endpoint_healthy", 0, endpoint=endpoint.health_url)
+                last_error = e
+            finally:
+                self._release(endpoint)
+
+
+def ollama_router(model_name, urls=None):
+    """Router over every configured Ollama endpoint for a model."""
+    endpoints = []
+    for url in urls or ollama_urls():
+        llm = PooledOllama(model=model_name, base_url=url)
+        endpoints.append(Endpoint(llm, llm.health_url))
+    return ModelRouter(endpoints, name=model_name)
+
+
+def openai_router(model_name, urls, api_key):
+    """Router over OpenAI-compatible endpoints (vLLM, LocalAI, llama.cpp server...) serving a model."""
+    from langchain_community.llms import OpenAI
+
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    endpoints = [Endpoint(OpenAI(model_name=model_name, temperature=0.7, api_key=api_key, base_url=url),
+                          f"{url}/models", headers)
+                 for url in urls]
+    return ModelRouter(endpoints, name=model_name)
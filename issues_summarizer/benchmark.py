@@ -0,0 +1,328 @@
+"""Benchmarks the fetch, format, summarize and export stages against local stand-ins.
+
+    python benchmark.py --issues 5000 --llm-latency 0.2 --output bench.json
+
+A fake GitHub REST server (paginated issues with Link, ETag and rate-limit headers) and a fake
+Ollama server (streamed completions with a configurable delay) run in-process, so results depend
+on this code and not on the network. Results are written as JSON for tracking regressions.
+"""
+import os
+import sys
+import json
+import time
+import re
+import random
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+OWNER, REPO = "bench", "synthetic"
+MODEL_NAME = "llama3.2"
+EPOCH = datetime(2024, 1, 1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark IssueLenz against a fake GitHub API and LLM.")
+    parser.add_argument("--issues", type=int, default=2000, help="Issues in the synthetic repo")
+    parser.add_argument("--body-size", type=int, default=1500, help="Average issue body length in characters")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="Seconds per GitHub request")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds before a completion starts")
+    parser.add_argument("--llm-tokens", type=int, default=40, help="Tokens streamed per completion")
+    parser.add_argument("--summaries", type=int, default=200, help="Issues to summarize")
+    parser.add_argument("--summary-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def synthetic_issues(count, body_size, seed):
+    """Issues updated in ascending order, with the PRs and closed issues a real repo has."""
+    rng = random.Random(seed)
+    issues = []
+    for number in range(1, count + 1):
+        created = EPOCH + timedelta(minutes=number * 7)
+        updated = created + timedelta(minutes=rng.randint(0, 5))
+        issue = {
+            "number": number,
+            "title": f"Synthetic issue {number}: {rng.choice(['crash', 'slow', 'typo', 'feature'])}",
+            "body": "".join(rng.choice("abcdefghij \n") for _ in range(rng.randint(body_size // 2, body_size * 3 // 2))),
+            "state": "closed" if rng.random() < 0.3 else "open",
+            "created_at": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "updated_at": updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "labels": [{"name": name} for name in rng.sample(["bug", "enhancement", "priority: high"], rng.randint(0, 2))],
+        }
+        if rng.random() < 0.1:
+            issue["pull_request"] = {"url": ""}
+        issues.append(issue)
+    issues.sort(key=lambda issue: issue["updated_at"])
+    return issues
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+
+class GitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload, headers=(), resource="core"):
+        body = json.dumps(payload).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        with self.server.lock:
+            self.server.remaining = max(0, self.server.remaining - 1)
+            remaining = self.server.remaining
+        status = 304 if self.headers.get("If-None-Match") == etag else 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        self.send_header("X-RateLimit-Resource", resource)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0" if status == 304 else str(len(body)))
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.count()
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == f"/repos/{OWNER}/{REPO}":
+            self.send_json({"created_at": EPOCH.strftime("%Y-%m-%dT%H:%M:%SZ")})
+        elif url.path == f"/repos/{OWNER}/{REPO}/labels":
+            self.send_json([{"name": name} for name in ["bug", "enhancement", "priority: high"]])
+        elif url.path == f"/repos/{OWNER}/{REPO}/issues":
+            since = query.get("since", "")
+            matching = [issue for issue in self.server.issues if issue["updated_at"] >= since]
+            per_page, page = int(query.get("per_page", 30)), int(query.get("page", 1))
+            last_page = max(1, -(-len(matching) // per_page))
+            headers = []
+            if last_page > 1:
+                base = f"{self.server.url}{url.path}?" + "&".join(
+                    f"{key}={value}" for key, value in query.items() if key != "page")
+                links = [f'<{base}&page={last_page}>; rel="last"']
+                if page < last_page:
+                    links.append(f'<{base}&page={page + 1}>; rel="next"')
+                headers.append(("Link", ", ".join(links)))
+            self.send_json(matching[(page - 1) * per_page:page * per_page], headers)
+        elif url.path == "/search/issues":
+            self.send_search(url.path, query)
+        else:
+            self.send_json({"message": "Not Found"})
+
+
+    def send_search(self, path, query):
+        """Open, non-PR issues matching the query's created range and labels, newest first, capped at 1000."""
+        qualifiers = dict(part.split(":", 1) for part in query["q"].split(" ") if ":" in part)
+        since, until = qualifiers["created"].split("..")
+        labels = re.findall(r'label:"([^"]*)"', query["q"])
+        matching = sorted(
+            (issue for issue in self.server.issues
+             if issue["state"] == "open" and "pull_request" not in issue and since <= issue["created_at"] <= until
+             and set(labels).issubset(label["name"] for label in issue["labels"])),
+            key=lambda issue: issue["created_at"], reverse=True,
+        )
+        per_page, page = int(query.get("per_page", 30)), int(query.get("page", 1))
+        last_page = max(1, -(-min(len(matching), 1000) // per_page))
+        headers = []
+        if last_page > 1:
+            base = f"{self.server.url}{path}?" + urlencode({key: value for key, value in query.items() if key != "page"})
+            headers.append(("Link", f'<{base}&page={last_page}>; rel="last"'))
+        items = matching[:1000][(page - 1) * per_page:page * per_page]
+        self.send_json({"total_count": len(matching), "incomplete_results": False, "items": items}, headers, "search")
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b'{"models": []}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.count()
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.latency)
+        lines = [json.dumps({"response": f"word{i} "}) for i in range(self.server.tokens)]
+        lines.append(json.dumps({"response": "", "done": True}))
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))]
+    return {"p50": pick(50), "p90": pick(90), "p99": pick(99), "max": values[-1]}
+
+
+def measure(name, func, items=None, servers=()):
+    """Runs one stage and returns its wall time, throughput, peak traced memory and request counts."""
+    before = {server_name: server.requests for server_name, server in servers}
+    tracemalloc.start()
+    started = time.perf_counter()
+    result, latencies = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = items if items is not None else len(result)
+    report = {
+        "items": count,
+        "seconds": round(elapsed, 4),
+        "items_per_second": round(count / elapsed, 2) if elapsed else None,
+        "peak_memory_mb": round(peak / 1e6, 2),
+        "requests": {server_name: server.requests - before[server_name] for server_name, server in servers},
+    }
+    if latencies:
+        report["latency_seconds"] = {key: round(value, 4) for key, value in percentiles(latencies).items()}
+    print(f"{name}: {report['seconds']}s, {report['items_per_second']} items/s", file=sys.stderr)
+    return result, report
+
+
+def run(args):
+    github = FakeServer(GitHubHandler, args.github_latency)
+    github.issues = synthetic_issues(args.issues, args.body_size, args.seed)
+    github.remaining = 5000
+    ollama = FakeServer(OllamaHandler, args.llm_latency)
+    ollama.tokens = args.llm_tokens
+    servers = [("github", github), ("llm", ollama)]
+
+    # Read at import time, so set before the app modules load
+    os.environ["GITHUB_API_URL"] = github.url
+    os.environ["OLLAMA_URLS"] = ollama.url
+    os.environ["ISSUELENZ_CACHE_DIR"] = tempfile.mkdtemp(prefix="issuelenz-bench-")
+
+    from github_client import get_github_client
+    from github_issues import fetch_github_issues, format_issues, iter_github_issues_search
+    from models import get_model
+    from summarizer import get_summary, map_as_completed
+    from summary_cache import SummaryCache
+    from export_summaries import EXPORT_WRITERS, export_to_file, with_summaries
+
+    client = get_github_client()
+    request_latencies = []
+    client_get = client.get
+
+    def timed_get(*get_args, **get_kwargs):
+        started = time.perf_counter()
+        try:
+            return client_get(*get_args, **get_kwargs)
+        finally:
+            request_latencies.append(time.perf_counter() - started)
+
+    client.get = timed_get
+    tokens = ["benchmark-token"]
+    since, until = EPOCH, EPOCH + timedelta(days=3650)
+    stages = {}
+
+    def fetch():
+        request_latencies.clear()
+        return fetch_github_issues(OWNER, REPO, since, until, tokens=tokens), list(request_latencies)
+
+    raw, stages["fetch_github_issues_cold"] = measure("fetch (cold)", fetch, servers=servers)
+    _, stages["fetch_github_issues_warm"] = measure("fetch (warm)", fetch, servers=servers)
+
+    def search():
+        request_latencies.clear()
+        return list(iter_github_issues_search(OWNER, REPO, since, until, tokens=tokens)), list(request_latencies)
+
+    _, stages["fetch_search"] = measure("fetch (search)", search, servers=servers)
+
+    issues, stages["format_issues"] = measure("format", lambda: (format_issues(raw, OWNER, REPO), None))
+
+    # Build the client up front so backend imports don't land in the first summary's latency
+    get_model(MODEL_NAME)
+    cache = SummaryCache(os.path.join(os.environ["ISSUELENZ_CACHE_DIR"], "bench_summaries.sqlite3"))
+    to_summarize = issues[:args.summaries]
+
+    def summarize():
+        def timed_summary(issue):
+            started = time.perf_counter()
+            return get_summary(issue, MODEL_NAME, cache), time.perf_counter() - started
+
+        summaries, latencies = {}, []
+        for issue, result, error in map_as_completed(timed_summary, to_summarize, args.summary_workers):
+            if error:
+                raise error
+            summaries[issue["url"]], latency = result
+            latencies.append(latency)
+        return summaries, latencies
+
+    summaries, stages["get_summary_cold"] = measure("summarize (cold)", summarize, servers=servers)
+    _, stages["get_summary_cached"] = measure("summarize (cached)", summarize, servers=servers)
+
+    for export_format, (writer, _, _) in EXPORT_WRITERS.items():
+        def export():
+            with export_to_file(writer, with_summaries(issues, summaries)) as export_file:
+                export_file.seek(0, os.SEEK_END)
+                return export_file.tell(), None
+
+        try:
+            size, report = measure(f"export {export_format}", export, items=len(issues))
+        except ImportError as e:
+            stages[f"export_{export_format.lower()}"] = {"skipped": str(e)}
+            continue
+        report["bytes"] = size
+        stages[f"export_{export_format.lower()}"] = report
+
+    return {
+        "generated_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "config": vars(args),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "stages": stages,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
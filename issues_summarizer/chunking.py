@@ -0,0 +1,123 @@
+import os
+from functools import lru_cache
+
+# Bodies above this many tokens are summarized chunk by chunk, then the chunk summaries are combined
+MAP_REDUCE_THRESHOLD = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD", "2000"))
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+# Hard cap on description tokens sent for one issue, across all of its chunks
+ISSUE_TOKEN_BUDGET = int(os.getenv("SUMMARY_ISSUE_TOKEN_BUDGET", "6000"))
+# Code blocks and logs longer than this keep only their head and tail
+MAX_BLOCK_LINES = int(os.getenv("SUMMARY_MAX_BLOCK_LINES", "40"))
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    """Counts tokens with tiktoken when installed, else estimates ~4 characters per token.
+
+    Local models use their own tokenizers, but both are close enough to size prompts and chunks.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _shorten_block(lines):
+    if len(lines) <= MAX_BLOCK_LINES:
+        return lines
+    head, tail = MAX_BLOCK_LINES // 2, MAX_BLOCK_LINES // 4
+    return lines[:head] + [f"[... {len(lines) - head - tail} lines omitted ...]"] + lines[-tail:]
+
+
+def _collapse_repeats(lines):
+    collapsed = []
+    repeats = 0
+    for line in lines:
+        if collapsed and line == collapsed[-1] and line.strip():
+            repeats += 1
+            continue
+        if repeats:
+            collapsed.append(f"[previous line repeated {repeats} more times]")
+            repeats = 0
+        collapsed.append(line)
+    if repeats:
+        collapsed.append(f"[previous line repeated {repeats} more times]")
+    return collapsed
+
+
+def compact_text(text):
+    """Shrinks log dumps and stack traces without touching ordinary prose.
+
+    Runs of identical lines collapse to one, repeated code blocks are dropped, and over-long code
+    blocks keep only their head and tail.
+    """
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    output = []
+    seen_blocks = set()
+    block = None
+
+    for line in lines:
+        if line.lstrip().startswith("```"):
+            if block is None:
+                block = [line]
+                continue
+            block.append(line)
+            body = "\n".join(block[1:-1])
+            if body in seen_blocks:
+                output.append("[duplicate code block omitted]")
+            else:
+                seen_blocks.add(body)
+                output.extend([block[0]] + _shorten_block(_collapse_repeats(block[1:-1])) + [line])
+            block = None
+        elif block is not None:
+            block.append(line)
+        else:
+            output.append(line)
+
+    if block is not None:
+        # Unclosed fence: treat the rest of the body as the block
+        output.extend(_shorten_block(_collapse_repeats(block)))
+
+    return "\n".join(_collapse_repeats(output)).strip()
+
+
+def truncate_to_budget(text, budget=ISSUE_TOKEN_BUDGET):
+    """Keeps the head and tail of text that exceeds the token budget."""
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return text
+    keep = int(len(text) * budget / tokens)
+    head, tail = keep * 2 // 3, keep // 3
+    return f"{text[:head]}\n[... truncated ...]\n{text[-tail:]}"
+
+
+def split_into_chunks(text, chunk_tokens=CHUNK_TOKENS):
+    """Splits text on line boundaries into chunks of at most `chunk_tokens` tokens."""
+    chunks = []
+    current, current_tokens = [], 0
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line)
+        if line_tokens > chunk_tokens:
+            # A single enormous line (minified output, base64...) is cut by characters
+            step = max(1, len(line) * chunk_tokens // line_tokens)
+            pieces = [line[start:start + step] for start in range(0, len(line), step)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > chunk_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
@@ -0,0 +1,166 @@
+"""Headless batch entry point: fetch, summarize and export issues for many repos without Streamlit.
+
+    python cli.py owner/repo https://github.com/owner/other --since 2024-01-01 --format json excel --output-dir digests
+
+Repos run on a worker pool and share one GitHub client, so they draw from the same rate-limit budget
+and PATs (PERSONAL_ACCESS_TOKEN / PERSONAL_ACCESS_TOKENS).
+"""
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from github_issues import FETCHERS, GitHubError, configured_tokens, fetch_owner_repos, iter_formatted_issues, parse_repo
+from metrics import serve_metrics
+from models import get_model
+from model_lifecycle import get_model_manager
+from summarizer import DEFAULT_MAX_WORKERS, summarize_issues, summarize_issues_packed
+from summary_cache import get_summary_cache
+
+logger = logging.getLogger("issuelenz")
+
+# --format choice -> export_summaries.EXPORT_WRITERS name
+EXPORT_FORMATS = {"excel": "Excel", "word": "Word", "json": "JSON", "ndjson": "NDJSON", "csv": "CSV", "parquet": "Parquet"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize open GitHub issues for one or more repositories.")
+    parser.add_argument("repos", nargs="*", help="owner/repo or GitHub repository URL")
+    parser.add_argument("--repos-file", help="File with one owner/repo or URL per line")
+    parser.add_argument("--owner", action="append", default=[],
+                        help="Every repository with open issues of this organization or user (repeatable)")
+    parser.add_argument("--since", help="Start date (YYYY-MM-DD), default 30 days ago")
+    parser.add_argument("--until", help="End date (YYYY-MM-DD), default today")
+    parser.add_argument("--labels", help="Comma-separated labels every issue must have")
+    parser.add_argument("--model", default="llama3.2", help="Model name as used in the app, e.g. llama3.2 or hf->org/model")
+    parser.add_argument("--format", nargs="+", choices=sorted(EXPORT_FORMATS), default=["json"], dest="formats")
+    parser.add_argument("--output-dir", default="exports")
+    parser.add_argument("--workers", type=int, default=4, help="Repositories processed at once")
+    parser.add_argument("--summary-workers", type=int, default=DEFAULT_MAX_WORKERS, help="Parallel LLM requests per repository")
+    parser.add_argument("--pack", action="store_true", help="Summarize several short issues per LLM request")
+    parser.add_argument("--api", choices=sorted(FETCHERS), default=os.getenv("GITHUB_API_MODE", "rest"),
+                        help="rest: sync the local index; search: filter on GitHub's side; graphql: open issues only, needs a PAT")
+    parser.add_argument("--graphql", action="store_const", const="graphql", dest="api", help="Same as --api graphql")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def read_repos(args):
+    specs = list(args.repos)
+    if args.repos_file:
+        with open(args.repos_file, encoding="utf-8") as repos_file:
+            specs.extend(line.strip() for line in repos_file if line.strip() and not line.startswith("#"))
+
+    repos = []
+    for spec in specs:
+        owner, repo = parse_repo(spec)
+        if owner is None:
+            raise SystemExit(f"Invalid GitHub repository: {spec}")
+        repos.append((owner, repo))
+    for owner in args.owner:
+        try:
+            repos.extend((owner, repo) for repo in fetch_owner_repos(owner, configured_tokens()))
+        except GitHubError as e:
+            raise SystemExit(f"Could not list the repositories of {owner}: {e}")
+    return list(dict.fromkeys(repos))
+
+
+def write_exports(issues, owner, repo, formats, output_dir):
+    # The writers pull in openpyxl and python-docx, so they load only once there is something to write
+    from export_summaries import EXPORT_WRITERS
+
+    paths = []
+    if not issues:
+        return paths
+    for export_format in formats:
+        writer, extension, _ = EXPORT_WRITERS[EXPORT_FORMATS[export_format]]
+        path = os.path.join(output_dir, f"{owner}_{repo}.{extension}")
+        # Stream straight into the file rather than through an in-memory copy
+        with open(path, "wb") as export_file:
+            writer(issues, export_file)
+        paths.append(path)
+    return paths
+
+
+def until_github_error(issues, errors):
+    """Pass issues through until a GitHubError ends the fetch, recording it in `errors`."""
+    try:
+        yield from issues
+    except GitHubError as e:
+        errors.append(e)
+
+
+def process_repo(owner, repo, args, since_date, until_date, tokens):
+    """Fetch, summarize and export one repository.
+
+    Returns the paths written and the GitHubError that cut the fetch short, if any; the issues
+    fetched before it are still summarized and exported.
+    """
+    labels = [label.strip() for label in args.labels.split(",")] if args.labels else None
+    fetch_errors = []
+    raw_issues = FETCHERS[args.api](owner, repo, since_date, until_date, labels, tokens)
+    issues = until_github_error(iter_formatted_issues(raw_issues, owner, repo), fetch_errors)
+
+    summarized = []
+    summarize = summarize_issues_packed if args.pack else summarize_issues
+    results = summarize(get_model(args.model), issues, args.summary_workers,
+                        cache=get_summary_cache(), model_name=args.model)
+    for issue, summary, error in results:
+        if error:
+            logger.warning("%s/%s#%s: failed to summarize: %s", owner, repo, issue["number"], error)
+        summarized.append({**issue, "summary": summary})
+
+    # Summaries finish in any order; keep exports stable between runs
+    summarized.sort(key=lambda issue: issue["number"], reverse=True)
+    paths = write_exports(summarized, owner, repo, args.formats, args.output_dir)
+    logger.info("%s/%s: %d issues summarized", owner, repo, len(summarized))
+    return paths, fetch_errors[0] if fetch_errors else None
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    # Lets Prometheus scrape long batch runs when METRICS_PORT is set
+    serve_metrics()
+
+    repos = read_repos(args)
+    if not repos:
+        raise SystemExit("No repositories given")
+
+    until_date = datetime.strptime(args.until, "%Y-%m-%d") if args.until else datetime.now()
+    since_date = datetime.strptime(args.since, "%Y-%m-%d") if args.since else until_date - timedelta(days=30)
+    tokens = configured_tokens()
+    os.makedirs(args.output_dir, exist_ok=True)
+    # Load the model while the first repos are still being fetched
+    get_model_manager().warm(args.model)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(process_repo, owner, repo, args, since_date, until_date, tokens): f"{owner}/{repo}"
+            for owner, repo in repos
+        }
+        for future in as_completed(futures):
+            try:
+                paths, fetch_error = future.result()
+                for path in paths:
+                    logger.info("wrote %s", path)
+                if fetch_error:
+                    failed += 1
+                    logger.error("%s: fetch stopped early, exported only the issues before it: %s",
+                                 futures[future], fetch_error)
+            except Exception:
+                failed += 1
+                logger.exception("%s failed", futures[future])
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
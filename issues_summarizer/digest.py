@@ -0,0 +1,111 @@
+import os
+import re
+from collections import Counter
+from typing import List, NamedTuple
+
+import numpy as np
+
+# Cosine similarity above which two issues are treated as reports of the same problem
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("DIGEST_SIMILARITY_THRESHOLD", "0.5"))
+# Optional Ollama embedding model (e.g. nomic-embed-text); TF-IDF is used when unset
+EMBEDDING_MODEL = os.getenv("DIGEST_EMBEDDING_MODEL", "")
+MAX_FEATURES = int(os.getenv("DIGEST_MAX_FEATURES", "8192"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]{2,}")
+
+
+class IssueCluster(NamedTuple):
+    """Near-duplicate issues; the first one is the representative."""
+    issues: List[dict]
+
+
+def issue_document(issue):
+    """Title weighted above the body, which is often mostly logs."""
+    return f"{issue['title']}\n{issue['title']}\n{issue['description'] or ''}"
+
+
+def tfidf_vectors(documents, max_features=MAX_FEATURES):
+    """L2-normalized sparse TF-IDF rows, one {term column: weight} dict per document.
+
+    Only the terms a document contains are stored, so memory grows with the text rather than
+    with documents x vocabulary.
+    """
+    counts = [Counter(TOKEN_PATTERN.findall(document.lower())) for document in documents]
+    document_frequency = Counter(term for count in counts for term in count)
+    vocabulary = {term: i for i, (term, _) in enumerate(document_frequency.most_common(max_features))}
+    idf = {term: np.log((1 + len(documents)) / (1 + document_frequency[term])) + 1 for term in vocabulary}
+
+    rows = []
+    for count in counts:
+        row = {vocabulary[term]: (1 + np.log(n)) * idf[term] for term, n in count.items() if term in vocabulary}
+        norm = np.sqrt(sum(weight * weight for weight in row.values())) or 1
+        rows.append({column: weight / norm for column, weight in row.items()})
+    return rows
+
+
+def sparse_similarity(rows):
+    """Returns a function giving the cosine similarity of every row to one row, via an inverted index."""
+    postings = {}
+    for i, row in enumerate(rows):
+        for column, weight in row.items():
+            documents, weights = postings.setdefault(column, ([], []))
+            documents.append(i)
+            weights.append(weight)
+    postings = {
+        column: (np.array(documents), np.array(weights, dtype=np.float32))
+        for column, (documents, weights) in postings.items()
+    }
+
+    def similarity(seed):
+        row = rows[seed].items()
+        if not row:
+            return np.zeros(len(rows), dtype=np.float32)
+        documents = np.concatenate([postings[column][0] for column, _ in row])
+        weights = np.concatenate([postings[column][1] * weight for column, weight in row])
+        return np.bincount(documents, weights=weights, minlength=len(rows))
+
+    return similarity
+
+
+def embedding_vectors(documents, model_name):
+    """L2-normalized embeddings from a local Ollama embedding model."""
+    from langchain_community.embeddings import OllamaEmbeddings
+
+    embeddings = OllamaEmbeddings(model=model_name).embed_documents(documents)
+    return normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def cluster_issues(issues, threshold=DEFAULT_SIMILARITY_THRESHOLD, embedding_model=EMBEDDING_MODEL):
+    """Groups near-duplicate issues, keeping the input order of representatives and members.
+
+    Each unassigned issue in turn seeds a cluster with every later unassigned issue whose cosine
+    similarity to it reaches `threshold`.
+    """
+    issues = list(issues)
+    if not issues:
+        return []
+
+    documents = [issue_document(issue) for issue in issues]
+    # One seed's row of similarities at a time, never the whole issues x issues matrix
+    if embedding_model:
+        vectors = embedding_vectors(documents, embedding_model)
+        similarity = lambda seed: vectors @ vectors[seed]
+    else:
+        similarity = sparse_similarity(tfidf_vectors(documents))
+
+    unassigned = np.ones(len(issues), dtype=bool)
+    clusters = []
+    for seed in range(len(issues)):
+        if not unassigned[seed]:
+            continue
+        members = np.flatnonzero(unassigned & (similarity(seed) >= threshold))
+        members = np.union1d(members, [seed])
+        unassigned[members] = False
+        clusters.append(IssueCluster([issues[i] for i in members]))
+    return clusters
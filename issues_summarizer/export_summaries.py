@@ -1,78 +1,254 @@
 import io
-import pandas as pd
-from docx import Document
-from fpdf import FPDF
-import json
-import csv
-import streamlit as st
 import os
 import re
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import csv
+import json
+import hashlib
+import zipfile
+import tempfile
+from functools import lru_cache, partial
+from itertools import chain, islice
+from xml.sax.saxutils import escape
+
+from docx import Document
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
 
-def export_summaries(export_format, issues):
-    if export_format != "None":
+from metrics import inc, timed
+from summary_cache import CACHE_DIR
+
+EXPORT_FIELDS = ["number", "title", "description", "created_at", "labels", "url", "summary"]
+# Exports stay in memory up to this size and spill to a temp file beyond it
+SPOOL_MAX_SIZE = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+# Rows per Parquet row group
+PARQUET_BATCH_SIZE = int(os.getenv("EXPORT_PARQUET_BATCH_SIZE", "5000"))
+# Finished exports kept on disk, named by a fingerprint of their content
+EXPORT_CACHE_ENTRIES = int(os.getenv("EXPORT_CACHE_ENTRIES", "8"))
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports")
+
+# Characters XML 1.0 can't hold; python-docx and openpyxl refuse them, so drop them from issue text
+INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def export_summaries(export_format, issues, summaries=None, version=None):
+    """Offers an export in two steps: the file is only built once "Prepare" is clicked, and only
+    read once "Download" is. The prepared file is offered again while `version` (e.g. the job
+    and how many summaries it has) stays the same."""
+    # Imported here so the writers below stay usable from the headless CLI
+    import streamlit as st
+
+    if export_format == "None":
+        return
+    _, extension, mime = EXPORT_WRITERS[export_format]
+    version = (export_format, version)
+    prepared = st.session_state.get("prepared_export")
+    if prepared is None or prepared[0] != version or not os.path.exists(prepared[1]):
+        if not st.button(f"Prepare {export_format} File"):
+            return
         try:
-            if export_format == "Excel":
-                xlsx_data = export_to_excel(issues)
-                st.download_button("Download Excel File", xlsx_data, "issues_summary.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            elif export_format == "Word":
-                word_data = export_to_word(issues)
-                st.download_button(
-                    "Download Word Document",
-                    word_data,
-                    "issues_summary.docx",
-                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                )
-            elif export_format == "JSON":
-                json_data = export_to_json(issues)
-                st.download_button("Download JSON File", json_data, "issues_summary.json", "application/json")
+            path = cached_export(export_format, with_summaries(issues, summaries or {}))
         except Exception as e:
             st.error(f"An error occurred while exporting the file: {str(e)}")
+            return
+        prepared = st.session_state.prepared_export = (version, path)
+    st.download_button(f"Download {export_format} File", partial(read_export, prepared[1]),
+                       f"issues_summary.{extension}", mime)
 
-def export_to_excel(issues):
-    if not issues:
-        return None
+def read_export(path):
+    with open(path, "rb") as export_file:
+        return export_file.read()
+
+def with_summaries(issues, summaries):
+    """Issues with their summaries, looked up by issue URL, attached; the caller's dicts stay untouched."""
+    return [{**issue, "summary": summaries.get(issue["url"], issue.get("summary"))} for issue in issues]
+
+def export_fingerprint(export_format, issues):
+    digest = hashlib.sha256(export_format.encode("utf-8"))
+    for issue in issues:
+        digest.update(json.dumps(issue, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def cached_export(export_format, issues):
+    """Path of the export file for issues, reused while neither the issues nor their summaries change.
+
+    Finished exports are kept on disk, not in memory, and only the most recent ones are kept.
+    """
+    writer, extension, _ = EXPORT_WRITERS[export_format]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{export_fingerprint(export_format, issues)}.{extension}")
+    if os.path.exists(path):
+        # Marks the export as recently used
+        os.utime(path)
+        inc("export_cache_hits_total", format=export_format)
+        return path
+
+    # Written under a temporary name, so a concurrent rerun never serves a half-written file
+    partial = tempfile.NamedTemporaryFile(dir=EXPORT_DIR, suffix=".partial", delete=False)
+    try:
+        with export_to_file(writer, issues, partial):
+            pass
+        os.replace(partial.name, path)
+    except BaseException:
+        os.remove(partial.name)
+        raise
+    forget_old_exports()
+    return path
+
+def forget_old_exports():
+    exports = []
+    for name in os.listdir(EXPORT_DIR):
+        try:
+            exports.append((os.path.getmtime(os.path.join(EXPORT_DIR, name)), name))
+        except FileNotFoundError:
+            continue  # Evicted by another session meanwhile
+    exports = sorted(export for export in exports if not export[1].endswith(".partial"))
+    for _, name in exports[:max(0, len(exports) - EXPORT_CACHE_ENTRIES)]:
+        try:
+            os.remove(os.path.join(EXPORT_DIR, name))
+        except FileNotFoundError:
+            pass
+
+def export_to_file(writer, issues, export_file=None):
+    """Runs a writer into `export_file`, a spooled temp file by default, and returns it rewound."""
+    export_format = writer.__name__.replace("write_", "")
+    if export_file is None:
+        export_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with timed("export_seconds", format=export_format):
+        writer(issues, export_file)
+    inc("export_bytes_total", export_file.tell(), format=export_format)
+    export_file.seek(0)
+    return export_file
+
+def joined_labels(issue, empty="No Label"):
+    return ", ".join(issue.get("labels") or []) or empty
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
+def write_excel(issues, output):
+    # Write-only workbooks stream rows to disk instead of keeping a cell object per value
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
 
-    headers = ["number", "title", "description", "created_at", "labels", "url"]
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
+    header = []
+    for field in EXPORT_FIELDS:
+        cell = WriteOnlyCell(ws, value=field)
         cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
 
-    for row_num, issue in enumerate(issues, 2):
-        for col_num, field in enumerate(headers, 1):
-            cell_value = issue.get(field, "")
-            if field == "labels":
-                cell_value = "No Label" if not cell_value else ", ".join(cell_value)
-            ws.cell(row=row_num, column=col_num, value=cell_value)
+    for issue in issues:
+        row = [joined_labels(issue) if field == "labels" else issue.get(field, "") for field in EXPORT_FIELDS]
+        # openpyxl rejects control characters, which turn up in pasted logs
+        ws.append([INVALID_XML_CHARS.sub("", value) if isinstance(value, str) else value for value in row])
 
-    output = io.BytesIO()
     wb.save(output)
-    output.seek(0)
 
-    return output
+@lru_cache(maxsize=1)
+def docx_template():
+    """Parts of an empty python-docx document, with its body split around where content goes."""
+    buffer = io.BytesIO()
+    Document().save(buffer)
+    with zipfile.ZipFile(buffer) as template:
+        parts = {name: template.read(name) for name in template.namelist()}
+    document_xml = parts.pop("word/document.xml").decode("utf-8")
+    body_start = document_xml.index("<w:body>") + len("<w:body>")
+    body_end = document_xml.index("<w:sectPr", body_start)
+    return parts, document_xml[:body_start], document_xml[body_end:]
 
-def export_to_word(issues):
-    doc = Document()
+def docx_paragraph(text, style=None):
+    text = INVALID_XML_CHARS.sub("", str(text))
+    runs = '</w:t><w:br/><w:t xml:space="preserve">'.join(escape(line) for line in text.split("\n"))
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{properties}<w:r><w:t xml:space="preserve">{runs}</w:t></w:r></w:p>'
+
+def write_word(issues, output):
+    # python-docx builds the whole document tree in memory, so write document.xml paragraph by
+    # paragraph into a copy of its default template instead
+    parts, body_start, body_end = docx_template()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as docx:
+        for name, data in parts.items():
+            docx.writestr(name, data)
+        with docx.open("word/document.xml", "w") as document:
+            document.write(body_start.encode("utf-8"))
+            for issue in issues:
+                labels = issue.get('labels', ['No label'])
+                document.write("".join([
+                    docx_paragraph(f"Issue #{issue['number']}: {issue['title']}", "Heading1"),
+                    docx_paragraph(f"Description: {issue['description']}"),
+                    docx_paragraph(f"Summary: {issue['summary']}") if issue.get('summary') else "",
+                    docx_paragraph(f"Created At: {issue['created_at']}"),
+                    docx_paragraph(f"Labels: {', '.join(labels)}"),
+                    docx_paragraph(f"URL: {issue['url']}"),
+                ]).encode("utf-8"))
+            document.write(body_end.encode("utf-8"))
+
+def json_record(issue):
+    # A copy, so the caller's issues keep their empty label lists
+    return {**issue, "labels": issue.get("labels") or ["No label"]}
+
+def write_json(issues, output):
+    # Same layout as json.dumps(issues, indent=4), one issue at a time
+    first = True
     for issue in issues:
-        doc.add_heading(f"Issue #{issue['number']}: {issue['title']}", level=1)
-        doc.add_paragraph(f"Description: {issue['description']}")
-        doc.add_paragraph(f"Created At: {issue['created_at']}")
-        labels = issue.get('labels', ['No label'])
-        doc.add_paragraph(f"Labels: {', '.join(labels)}")
-        doc.add_paragraph(f"URL: {issue['url']}")
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+        item = json.dumps(json_record(issue), indent=4).replace("\n", "\n    ")
+        output.write(f"{'[' if first else ','}\n    {item}".encode("utf-8"))
+        first = False
+    output.write(b"[]" if first else b"\n]")
 
-def export_to_json(issues):
+def write_ndjson(issues, output):
     for issue in issues:
-        if not issue.get('labels'):
-            issue['labels'] = ['No label']
-    return json.dumps(issues, indent=4).encode('utf-8')
+        output.write(json.dumps(json_record(issue)).encode("utf-8") + b"\n")
+
+def write_csv(issues, output):
+    # Encoded row by row rather than through io.TextIOWrapper, which can't wrap Python 3.9's
+    # SpooledTemporaryFile (it has no readable() before 3.11)
+    line = io.StringIO()
+    writer = csv.writer(line)
+    rows = ([joined_labels(issue) if field == "labels" else issue.get(field, "") for field in EXPORT_FIELDS]
+            for issue in issues)
+    for row in chain([EXPORT_FIELDS], rows):
+        writer.writerow(row)
+        output.write(line.getvalue().encode("utf-8"))
+        line.seek(0)
+        line.truncate()
+
+def write_parquet(issues, output):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("number", pa.int64()), ("title", pa.string()), ("description", pa.string()),
+        ("created_at", pa.string()), ("labels", pa.list_(pa.string())), ("url", pa.string()),
+        ("summary", pa.string()),
+    ])
+    issues = iter(issues)
+    with pq.ParquetWriter(output, schema) as writer:
+        while True:
+            batch = list(islice(issues, PARQUET_BATCH_SIZE))
+            if not batch:
+                break
+            columns = {field: [issue.get(field) for issue in batch] for field in schema.names}
+            columns["labels"] = [issue.get("labels") or [] for issue in batch]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+EXPORT_WRITERS = {
+    "Excel": (write_excel, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Word": (write_word, "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "JSON": (write_json, "json", "application/json"),
+    "NDJSON": (write_ndjson, "ndjson", "application/x-ndjson"),
+    "CSV": (write_csv, "csv", "text/csv"),
+    "Parquet": (write_parquet, "parquet", "application/vnd.apache.parquet"),
+}
+
+def export_to_excel(issues):
+    if not issues:
+        return None
+    return export_to_file(write_excel, issues)
+
+def export_to_word(issues):
+    return export_to_file(write_word, issues)
+
+def export_to_json(issues):
+    return export_to_file(write_json, issues)
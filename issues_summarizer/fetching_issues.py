@@ -1,142 +1,83 @@
-import requests
 import streamlit as st
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 
-load_dotenv()
+from github_client import MAX_RATE_LIMIT_WAIT, get_github_client
+from metrics import inc
+from github_issues import (
+    AuthenticationError,
+    GitHubError,
+    RateLimitError,
+    configured_tokens,
+    fetch_owner_labels,
+    fetch_owner_repos,
+    fetch_repo_labels,
+    relevant_labels,
+)
 
-# Store the token in session state to persist it across requests
-if "personal_access_token" not in st.session_state:
-    st.session_state.personal_access_token = os.getenv('PERSONAL_ACCESS_TOKEN', None)
+load_dotenv()
 
-# Store fetched labels in session state to reduce redundant API calls
-if "cached_labels" not in st.session_state:
-    st.session_state.cached_labels = {}
+# Thin Streamlit layer over github_issues: session state, messages and the rate-limit prompt live here
 
-def check_rate_limit():
-    """Check GitHub API rate limit and redirect user to PAT settings if needed."""
-
-    # Ensure personal access token is initialized
+def github_tokens():
+    """The session PAT first, then any extra PATs from PERSONAL_ACCESS_TOKENS to rotate across."""
     if "personal_access_token" not in st.session_state:
         st.session_state.personal_access_token = os.getenv("PERSONAL_ACCESS_TOKEN", "")
 
-    github_token = st.session_state.personal_access_token
-    headers = {"Authorization": f"Bearer {github_token}"} if github_token else {}
+    return configured_tokens(st.session_state.personal_access_token)
 
-    url = "https://api.github.com/rate_limit"
-    response = requests.get(url, headers=headers)
+def report_github_error(error, status=st):
+    """Show a GitHubError raised by the core fetch."""
+    if isinstance(error, RateLimitError):
+        status.error("⚠️ Rate limit exceeded. Showing the issues synced so far.")
+    elif isinstance(error, AuthenticationError):
+        status.error("❌ Invalid GitHub token. Please check your token.")
+    else:
+        status.error(f"❌ {error}")
 
-    if response.status_code == 200:
-        rate_limit_data = response.json()
-        remaining = rate_limit_data["rate"]["remaining"]
-        reset_timestamp = rate_limit_data["rate"]["reset"]
+def check_rate_limit():
+    """Check the tracked GitHub API budget and redirect user to PAT settings if it is spent."""
 
-        # Convert Unix timestamp to human-readable time
-        reset_time = datetime.utcfromtimestamp(reset_timestamp).strftime('%Y-%m-%d %H:%M:%S UTC')
+    # The budget is fed by the rate-limit headers of earlier responses, so this costs no request
+    reset_timestamp = get_github_client().budget.exhausted_until(github_tokens())
+    if reset_timestamp is None:
+        inc("rate_limit_checks_total", result="ok")
+        return True
 
-        if remaining == 0:
-            st.warning(f"⚠️ API rate limit exceeded. Try again after **{reset_time}**.")
-            st.warning("⚠️ To continue using the app, configure a Personal Access Token (PAT).")
+    # Convert Unix timestamp to human-readable time
+    reset_time = datetime.utcfromtimestamp(reset_timestamp).strftime('%Y-%m-%d %H:%M:%S UTC')
 
-            if st.button("🔑 Configure Personal Access Token"):
-                st.switch_page("pages/🔑_Personal_Access_Token_Settings.py")
+    if reset_timestamp - time.time() <= MAX_RATE_LIMIT_WAIT:
+        st.info(f"⏳ API rate limit reached. Fetching will pause and resume at **{reset_time}**.")
+        inc("rate_limit_checks_total", result="pausing")
+        return True
 
-            return False
+    inc("rate_limit_checks_total", result="exhausted")
+    st.warning(f"⚠️ API rate limit exceeded. Try again after **{reset_time}**.")
+    st.warning("⚠️ To continue using the app, configure a Personal Access Token (PAT).")
 
-        return True
-    else:
-        st.error(f"❌ Failed to check rate limit. HTTP {response.status_code}")
-        return False
-    
+    if st.button("🔑 Configure Personal Access Token"):
+        st.switch_page("pages/🔑_Personal_Access_Token_Settings.py")
 
-def fetch_github_issues(owner, repo, since_date, until_date, labels=None):
-    """Fetch GitHub issues with proper error handling and date filtering."""
-    
-    if not check_rate_limit():
-        return []
+    return False
+
+def show_fetch_details(stats, status=st):
+    """Display counts for a fetched batch of raw issues."""
+    for warning in stats.warnings:
+        status.warning(f"⚠️ {warning}")
 
-    github_token = st.session_state.personal_access_token
-    headers = {
-        'User-Agent': "Github-Issues_Scraper_&_Summarizer",
-        'Authorization': f'Bearer {github_token}' if github_token else ''
-    }
-
-    url = f"https://api.github.com/repos/{owner}/{repo}/issues"
-    params = {
-        "since": since_date.isoformat(),
-        "state": "all",
-        "per_page": 100
-    }
-
-    if labels:
-        params["labels"] = ",".join(labels)
-
-    issues = []
-    page = 1
-
-    while True:
-        params["page"] = page
-        response = requests.get(url, params=params, headers=headers)
-        
-        if response.status_code == 403:
-            st.error("⚠️ Rate limit exceeded. Retrying after reset...")
-            return []
-        elif response.status_code == 401:
-            st.error("❌ Invalid GitHub token. Please check your token.")
-            return []
-        elif response.status_code != 200:
-            st.error(f"❌ Failed to fetch issues. HTTP Status: {response.status_code} - {response.text}")
-            return []
-
-        new_issues = response.json()
-
-        if not new_issues:
-            break  # No more issues to fetch
-        
-        # Convert `until_date` to naive datetime
-        until_date_dt = until_date.replace(tzinfo=None) if until_date.tzinfo else until_date
-
-        # Filter issues based on `created_at`
-        filtered_issues = [
-            issue for issue in new_issues 
-            if "created_at" in issue and since_date <= datetime.strptime(issue["created_at"], "%Y-%m-%dT%H:%M:%SZ") <= until_date_dt
-        ]
-
-        issues.extend(filtered_issues)
-
-        # Stop pagination if the last fetched issue is older than `until_date`
-        last_issue_date = datetime.strptime(new_issues[-1]["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-        if last_issue_date < until_date:
-            break
-
-        page += 1
-
-    # Count pull requests (PRs have the "pull_request" key in the response)
-    pull_requests = sum(1 for issue in issues if "pull_request" in issue)
-
-    # Filter out pull requests from issues
-    non_pr_issues = [issue for issue in issues if "pull_request" not in issue]
-
-    # Count open and closed issues (excluding pull requests)
-    open_issues = sum(1 for issue in non_pr_issues if issue.get("state") == "open")
-    closed_issues = sum(1 for issue in non_pr_issues if issue.get("state") == "closed")
-
-    # Display the result in a styled box
-    st.markdown(f"""
+    status.markdown(f"""
     <div style="background-color: #EEF9F1; padding: 10px; border-radius: 5px;">
        <h3 style="color: #3C763D;">✅ Fetched Issues Details</h3>
-       <p>📊 <b>Total Fetched Issues:</b> {len(issues)}</p>
-       <p>🔄 <b>Pull Requests:</b> {pull_requests}</p>
-       <p>🔴 <b>Open Issues:</b> {open_issues}</p>
-       <p>🟢 <b>Closed Issues:</b> {closed_issues}</p>
+       <p>📊 <b>Total Fetched Issues:</b> {stats.total}</p>
+       <p>🔄 <b>Pull Requests:</b> {stats.pull_requests}</p>
+       <p>🔴 <b>Open Issues:</b> {stats.open_issues}</p>
+       <p>🟢 <b>Closed Issues:</b> {stats.closed_issues}</p>
     </div>
     """, unsafe_allow_html=True)
 
-    
-    return issues
-
 def fetch_github_labels(owner, repo):
     """Fetch GitHub labels and cache results to optimize performance."""
     
@@ -151,46 +92,56 @@ def fetch_github_labels(owner, repo):
     if not check_rate_limit():
         return []
 
-    github_token = st.session_state.personal_access_token
-    headers = {"Authorization": f"Bearer {github_token}"} if github_token else {}
+    try:
+        labels = fetch_repo_labels(owner, repo, github_tokens(), wait=False)
+    except GitHubError as e:
+        st.error(f"❌ Failed to fetch labels: {e}")
+        return []
+
+    # Cache labels for future use
+    st.session_state.cached_labels[cache_key] = relevant_labels(labels)
+    return st.session_state.cached_labels[cache_key]
+
+def fetch_github_owner_repos(owner):
+    """List an organization's or user's repositories with open issues, cached for the session."""
+
+    if "cached_owner_repos" not in st.session_state:
+        st.session_state.cached_owner_repos = {}
+
+    if owner in st.session_state.cached_owner_repos:
+        return st.session_state.cached_owner_repos[owner]
+
+    if not check_rate_limit():
+        return []
+
+    try:
+        repos = fetch_owner_repos(owner, github_tokens(), wait=False)
+    except GitHubError as e:
+        st.error(f"❌ Failed to list repositories: {e}")
+        return []
+
+    st.session_state.cached_owner_repos[owner] = repos
+    return repos
 
-    url = f"https://api.github.com/repos/{owner}/{repo}/labels"
-    labels = []
-    page = 1
+def fetch_github_owner_labels(owner, repos):
+    """Fetch the labels of several repositories at once and cache the merged, relevant ones."""
 
-    while True:
-        params = {"page": page, "per_page": 100}
-        response = requests.get(url, params=params, headers=headers)
+    if "cached_labels" not in st.session_state:
+        st.session_state.cached_labels = {}
 
-        if response.status_code == 200:
-            data = response.json()
-            if not data:
-                break
-            labels.extend([label['name'] for label in data])
-            page += 1
-        else:
-            st.error(f"❌ Failed to fetch labels. HTTP {response.status_code}")
-            break
+    cache_key = f"{owner}/{','.join(sorted(repos))}"
 
-    relevant_keywords = ['bug', 'priority', 'kind', 'enhancement', 'help wanted', 'good first issue']
-    relevant_labels = [label for label in labels if any(keyword in label.lower() for keyword in relevant_keywords)]
+    if cache_key in st.session_state.cached_labels:
+        return st.session_state.cached_labels[cache_key]
 
-    # Cache labels for future use
-    st.session_state.cached_labels[cache_key] = relevant_labels if relevant_labels else labels
-    return st.session_state.cached_labels[cache_key]
+    if not check_rate_limit():
+        return []
 
-def format_issues(issues, owner, repo):
-    """Formats issues into a structured dictionary."""
-    return [
-        {
-            "number": issue.get("number"),
-            "title": issue.get("title"),
-            "description": issue.get("body", "(No description provided)"),
-            "created_at": issue.get("created_at", ""),
-            "url": f"https://github.com/{owner}/{repo}/issues/{issue.get('number')}",
-            "labels": [label['name'] for label in issue.get('labels', [])]
-        }
-        #for issue in issues if "pull_request" not in issue
-
-        for issue in issues if issue.get("state") == "open" and "pull_request" not in issue
-    ]
+    try:
+        labels = fetch_owner_labels(owner, repos, github_tokens(), wait=False)
+    except GitHubError as e:
+        st.error(f"❌ Failed to fetch labels: {e}")
+        return []
+
+    st.session_state.cached_labels[cache_key] = relevant_labels(labels)
+    return st.session_state.cached_labels[cache_key]
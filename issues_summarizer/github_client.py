@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from metrics import inc, observe, set_gauge, timed, token_label
+from summary_cache import CACHE_DIR
+
+USER_AGENT = "Github-Issues_Scraper_&_Summarizer"
+# Point at GitHub Enterprise (https://host/api/v3) or a local stand-in
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{API_URL}/graphql")
+POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "16"))
+MAX_RATE_LIMIT_RETRIES = int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", "3"))
+# Longest pause for a primary rate-limit reset before giving up on a request
+MAX_RATE_LIMIT_WAIT = int(os.getenv("GITHUB_MAX_RATE_LIMIT_WAIT", "3600"))
+# Calls held back per token, so concurrent workers don't overshoot the budget between header updates
+RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "5"))
+ETAG_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_ETAG_CACHE_MAX_ENTRIES", "20000"))
+
+# Headers worth replaying from a cached response; rate-limit headers always come from the fresh 304
+REPLAYED_HEADERS = ("Content-Type", "Link", "ETag", "Last-Modified")
+
+
+class GitHubError(Exception):
+    """A GitHub request failed; issues yielded before the error stay valid."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RateLimitError(GitHubError):
+    pass
+
+
+class ETagCache:
+    """On-disk store of GitHub response bodies keyed by request, used to replay 304 responses."""
+
+    def __init__(self, path=None, max_entries=ETAG_CACHE_MAX_ENTRIES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "http_cache.sqlite3")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns (etag, last_modified, headers, body) for key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]), row[3]
+
+    def set(self, key, response):
+        headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, last_modified, headers, body, stored_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 json.dumps(headers), response.content, time.time()),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+
+def request_key(url, params, headers):
+    """Cache key for a GET; the token is hashed in so private data never leaks across PATs."""
+    digest = hashlib.sha256()
+    digest.update(url.encode("utf-8"))
+    digest.update(json.dumps(sorted((params or {}).items()), default=str).encode("utf-8"))
+    digest.update((headers or {}).get("Authorization", "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_primary_rate_limit(response):
+    return response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0"
+
+
+def is_secondary_rate_limit(response):
+    """GitHub signals secondary limits with 403/429 while the primary budget is not exhausted."""
+    if response.status_code not in (403, 429) or is_primary_rate_limit(response):
+        return False
+    return "Retry-After" in response.headers or "secondary rate limit" in response.text.lower()
+
+
+class RateLimitBudget:
+    """Per-token GitHub API budget, fed by the X-RateLimit-* headers of every response.
+
+    REST ("core") and GraphQL calls draw from separate budgets, so each is tracked per resource.
+    """
+
+    def __init__(self, reserve=RATE_LIMIT_RESERVE):
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._limits = {}  # (token, resource) -> [remaining, reset epoch seconds]
+
+    def update(self, token, response, resource="core"):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        resource = response.headers.get("X-RateLimit-Resource", resource)
+        with self._lock:
+            self._limits[(token, resource)] = [int(remaining), int(reset)]
+        set_gauge("github_rate_limit_remaining", int(remaining), token=token_label(token), resource=resource)
+
+    def _available(self, key, now):
+        remaining, reset = self._limits.get(key, (None, 0))
+        if remaining is None or reset <= now:
+            return float("inf")  # Unknown, or the window has already rolled over
+        return remaining - self.reserve
+
+    def snapshot(self):
+        """Returns {(token, resource): (remaining, reset)} for display."""
+        with self._lock:
+            return {key: tuple(limit) for key, limit in self._limits.items()}
+
+    def exhausted_until(self, tokens, resource="core"):
+        """Returns the earliest reset time if every token is spent, else None."""
+        keys = [(token, resource) for token in (list(tokens) or [None])]
+        with self._lock:
+            now = time.time()
+            if any(self._available(key, now) > 0 for key in keys):
+                return None
+            return min(self._limits[key][1] for key in keys)
+
+    def acquire(self, tokens, resource="core", wait=True):
+        """Picks the token with the most budget left, pausing until a reset if all of them are spent.
+
+        Without `wait`, the best token is returned right away even when it is spent.
+        """
+        keys = [(token, resource) for token in (list(tokens) or [None])]
+        while True:
+            with self._lock:
+                now = time.time()
+                key = max(keys, key=lambda k: self._available(k, now))
+                token = key[0]
+                if self._available(key, now) > 0:
+                    if key in self._limits and self._limits[key][1] > now:
+                        self._limits[key][0] -= 1
+                    return token
+                pause = min(self._limits[k][1] for k in keys) - now + 1
+            if not wait or pause > MAX_RATE_LIMIT_WAIT:
+                return token  # Let the request fail instead of hanging for hours
+            time.sleep(pause)
+            observe("github_rate_limit_wait_seconds", pause, resource=resource)
+
+
+class GitHubClient:
+    """Pooled keep-alive session for GitHub with retries, rate-limit budgeting and ETag revalidation."""
+
+    def __init__(self, etag_cache=None, budget=None):
+        self.etag_cache = etag_cache if etag_cache is not None else ETagCache()
+        self.budget = budget if budget is not None else RateLimitBudget()
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            # Hand the last 5xx back, so callers raise a GitHubError for it instead of a RetryError
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, params=None, headers=None, tokens=None, resource="core", cache=False, wait=True):
+        """GET authenticated with the best of `tokens`.
+
+        Secondary rate limits are waited out, and a spent token is swapped for another one,
+        or the call pauses until the reset, instead of failing. `resource` names the rate-limit
+        budget the endpoint draws from ("search" for the Search API). With `cache`, the body is
+        kept for ETag revalidation and a 304 is replayed as the cached 200; only ask for it on
+        URLs that repeat, as bodies of one-off URLs would just pile up on disk.
+
+        Pass `wait=False` for calls someone is waiting on, e.g. from the Streamlit script: once
+        every token is spent they serve the cached body if there is one, and raise
+        RateLimitError otherwise, instead of pausing.
+        Raises GitHubError if the request can't be sent.
+        """
+        tokens = list(tokens) if tokens else [None]
+        base_headers = {name: value for name, value in (headers or {}).items() if value}
+        response = None
+
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            token = self.budget.acquire(tokens, resource, wait)
+            request_headers = dict(base_headers)
+            if token:
+                request_headers["Authorization"] = f"Bearer {token}"
+
+            key = request_key(url, params, request_headers)
+            cached = self.etag_cache.get(key) if cache else None
+            if cached:
+                etag, last_modified, _, _ = cached
+                if etag:
+                    request_headers["If-None-Match"] = etag
+                if last_modified:
+                    request_headers["If-Modified-Since"] = last_modified
+            spent = not wait and self.budget.exhausted_until(tokens, resource) is not None
+            if spent and not cached:
+                inc("github_rate_limit_refusals_total", resource=resource)
+                raise RateLimitError("Rate limit exceeded")
+
+            with timed("github_request_seconds", resource=resource):
+                response = self._send(self.session.get, url, params=params, headers=request_headers)
+            inc("github_requests_total", resource=resource, status=response.status_code)
+            self.budget.update(token, response, resource)
+
+            if response.status_code == 304 and cached:
+                inc("github_etag_hits_total")
+                return self._replay(response, cached)
+            if spent and is_primary_rate_limit(response):
+                # A 304 costs nothing, but GitHub may refuse even that; the last copy beats waiting
+                inc("github_stale_replays_total", resource=resource)
+                return self._replay(response, cached)
+            if self._should_retry(response, tokens, resource, attempt, wait):
+                continue
+            if cache and response.status_code == 200 and ("ETag" in response.headers or "Last-Modified" in response.headers):
+                self.etag_cache.set(key, response)
+            return response
+
+        return response
+
+    def graphql(self, query, variables=None, tokens=None):
+        """POSTs a GraphQL v4 query; GraphQL needs a token, so pass at least one in `tokens`.
+
+        Raises GitHubError if the request can't be sent.
+        """
+        tokens = list(tokens) if tokens else [None]
+        response = None
+
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            token = self.budget.acquire(tokens, "graphql")
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            with timed("github_request_seconds", resource="graphql"):
+                response = self._send(
+                    self.session.post, GRAPHQL_URL, json={"query": query, "variables": variables or {}}, headers=headers
+                )
+            inc("github_requests_total", resource="graphql", status=response.status_code)
+            self.budget.update(token, response, "graphql")
+            if self._should_retry(response, tokens, "graphql", attempt):
+                continue
+            return response
+
+        return response
+
+    @staticmethod
+    def _send(method, url, **kwargs):
+        try:
+            return method(url, **kwargs)
+        except requests.RequestException as e:
+            inc("github_request_errors_total")
+            raise GitHubError(f"GitHub request failed: {e}") from e
+
+    def _should_retry(self, response, tokens, resource, attempt, wait=True):
+        """Waits out a rate limit and says whether the request is worth sending again.
+
+        Without `wait`, only swapping to a token with budget left is worth it.
+        """
+        if not wait:
+            return is_primary_rate_limit(response) and self.budget.exhausted_until(tokens, resource) is None
+        if is_secondary_rate_limit(response):
+            wait = int(response.headers.get("Retry-After", 0)) or 2 ** (attempt + 2)
+            time.sleep(wait)
+            observe("github_secondary_rate_limit_wait_seconds", wait, resource=resource)
+            return True
+        if is_primary_rate_limit(response):
+            reset = self.budget.exhausted_until(tokens, resource)
+            # acquire() rotates to another token or waits for the reset on the next attempt
+            return reset is None or reset - time.time() <= MAX_RATE_LIMIT_WAIT
+        return False
+
+    @staticmethod
+    def _replay(not_modified, cached):
+        _, _, cached_headers, body = cached
+        replayed = requests.Response()
+        replayed.status_code = 200
+        replayed._content = body
+        replayed.headers = CaseInsensitiveDict(cached_headers)
+        for name, value in not_modified.headers.items():
+            if name.lower().startswith("x-ratelimit"):
+                replayed.headers[name] = value
+        replayed.url = not_modified.url
+        replayed.request = not_modified.request
+        replayed.encoding = "utf-8"
+        replayed.from_cache = True
+        return replayed
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_github_client():
+    """Returns the process-wide GitHub client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GitHubClient()
+        return _client
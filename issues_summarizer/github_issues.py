@@ -0,0 +1,618 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, TypedDict
+from urllib.parse import parse_qs, urlparse
+
+from github_client import API_URL, GitHubError, RateLimitError, get_github_client
+from issue_store import get_issue_store, to_github_date
+from metrics import inc, log_event, observe
+
+# Concurrent page downloads per paginated call; kept small to stay clear of secondary rate limits
+PAGE_FETCH_WORKERS = int(os.getenv("GITHUB_PAGE_WORKERS", "8"))
+# The Search API allows 30 requests a minute, so its pages are fetched with less concurrency
+SEARCH_PAGE_WORKERS = int(os.getenv("GITHUB_SEARCH_PAGE_WORKERS", "2"))
+# GitHub returns at most this many results per search query, however many match
+SEARCH_RESULT_LIMIT = 1000
+# Repositories fetched at once in owner mode; all of them share the client's connections and budget
+REPO_FETCH_WORKERS = int(os.getenv("GITHUB_REPO_WORKERS", "4"))
+
+logger = logging.getLogger(__name__)
+
+
+class AuthenticationError(GitHubError):
+    pass
+
+
+def raise_for_github_status(response, what):
+    """Raises the GitHubError matching a non-200 response."""
+    if response.status_code == 200:
+        return
+    if response.status_code in (403, 429):
+        # The client already paused or rotated tokens before giving up
+        raise RateLimitError("Rate limit exceeded", response.status_code)
+    if response.status_code == 401:
+        raise AuthenticationError("Invalid GitHub token", response.status_code)
+    raise GitHubError(f"Failed to fetch {what}. HTTP Status: {response.status_code} - {response.text}", response.status_code)
+
+
+@dataclass
+class FetchStats:
+    """Counts of the raw issues that passed through a fetch."""
+
+    total: int = 0
+    pull_requests: int = 0
+    open_issues: int = 0
+    closed_issues: int = 0
+    warnings: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RepoProgress:
+    """Where one repository stands in an owner-wide fetch."""
+
+    repo: str
+    state: str = "queued"
+    issues: int = 0
+    stats: FetchStats = field(default_factory=FetchStats)
+    error: Optional[str] = None
+
+
+class FormattedIssue(TypedDict):
+    number: int
+    title: str
+    description: Optional[str]
+    created_at: str
+    url: str
+    labels: List[str]
+
+
+def parse_repo(spec):
+    """Returns (owner, repo) from an `owner/repo` string or a GitHub URL, or (None, None)."""
+    path_parts = urlparse(spec).path.strip('/').split('/') if "://" in spec else spec.strip('/').split('/')
+    if len(path_parts) >= 2 and path_parts[0] and path_parts[1]:
+        return path_parts[0], path_parts[1]
+    return None, None
+
+
+def configured_tokens(extra=None):
+    """`extra` first, then PERSONAL_ACCESS_TOKEN and any PERSONAL_ACCESS_TOKENS to rotate across."""
+    tokens = [extra, os.getenv("PERSONAL_ACCESS_TOKEN", "")] + os.getenv("PERSONAL_ACCESS_TOKENS", "").split(",")
+    return list(dict.fromkeys(token.strip() for token in tokens if token and token.strip()))
+
+
+def fetch_repo_creation_date(owner, repo, tokens=None, wait=True):
+    """Returns a repo's creation date as a naive UTC datetime.
+
+    `wait=False` raises RateLimitError instead of pausing for a rate-limit reset, see GitHubClient.get().
+    """
+    tokens = configured_tokens() if tokens is None else tokens
+    response = get_github_client().get(f"{API_URL}/repos/{owner}/{repo}", tokens=tokens, cache=True, wait=wait)
+    raise_for_github_status(response, "repository")
+    return datetime.strptime(response.json()['created_at'], "%Y-%m-%dT%H:%M:%SZ")
+
+
+def last_page_number(response):
+    """Read the last page number from a response's `Link: rel="last"` header."""
+    last_url = response.links.get("last", {}).get("url")
+    if not last_url:
+        return 1
+    return int(parse_qs(urlparse(last_url).query).get("page", ["1"])[0])
+
+
+def iter_pages(url, params, tokens, max_workers=PAGE_FETCH_WORKERS, resource="core", cache=False, wait=True):
+    """Yield page responses in page order, fetching every page after the first concurrently.
+
+    `cache` revalidates pages by ETag, for listings whose URLs repeat (labels, an owner's repos).
+    `wait` is passed on to GitHubClient.get().
+    """
+    client = get_github_client()
+    first = client.get(url, params={**params, "page": 1}, tokens=tokens, resource=resource, cache=cache, wait=wait)
+    yield first
+
+    last_page = last_page_number(first) if first.status_code == 200 else 1
+    if last_page <= 1:
+        return
+
+    def get_page(page):
+        return client.get(url, params={**params, "page": page}, tokens=tokens, resource=resource, cache=cache,
+                          wait=wait)
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, last_page - 1))
+    pages = iter(range(2, last_page + 1))
+    # Only `max_workers` pages are in flight; the next one is requested as each is consumed,
+    # so a slow consumer holds a bounded number of pages however large the repo
+    in_flight = deque(pool.submit(get_page, page) for page in islice(pages, max_workers))
+    try:
+        while in_flight:
+            response = in_flight.popleft().result()
+            for page in islice(pages, 1):
+                in_flight.append(pool.submit(get_page, page))
+            yield response
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_keyset_pages(url, params, tokens, until=None):
+    """Yield pages of issues sorted by update time, oldest first, moving `since` past each page.
+
+    Page numbers shift when an issue is updated mid-walk and moves to the end, which would
+    skip the issue sliding into an already fetched page; moving `since` doesn't. `since` is
+    inclusive, so issues on the boundary are fetched again. Stops after a short page or, with
+    `until`, after the first page reaching past it.
+    """
+    client = get_github_client()
+    params = dict(params)
+    page_number = 1
+    while True:
+        response = client.get(url, params={**params, "page": page_number}, tokens=tokens)
+        raise_for_github_status(response, "issues")
+        page = response.json()
+        yield page
+
+        if len(page) < params["per_page"] or (until and page[-1]["updated_at"] > until):
+            return
+        if page[-1]["updated_at"] > params["since"]:
+            params["since"] = page[-1]["updated_at"]
+            page_number = 1
+        else:
+            # A whole page updated within the same second; step through those by page number
+            page_number += 1
+
+
+def server_time(response):
+    """The GitHub timestamp a response was served at, or None without a Date header."""
+    date = response.headers.get("Date")
+    return to_github_date(parsedate_to_datetime(date).astimezone(timezone.utc).replace(tzinfo=None)) if date else None
+
+
+def iter_synced_pages(owner, repo, since_date, tokens):
+    """Download issues updated after the stored high-water mark into the local issue store, yielding each saved page.
+
+    Pages are fetched concurrently by number. Issues updated meanwhile move to the end and shift
+    the ones after them, so a short keyset pass then re-reads everything updated since the first
+    page was served, and if that shows such moves, each page boundary is read again. The
+    high-water mark only advances once the whole pass is in the store.
+    """
+    store = get_issue_store()
+    requested_start = to_github_date(since_date)
+    coverage_start, high_water_mark = store.get_sync_state(owner, repo)
+
+    if coverage_start is None or requested_start < coverage_start:
+        # The store doesn't reach back far enough yet, so backfill from the requested date
+        cursor = requested_start
+        coverage_start = requested_start
+    else:
+        # Only the delta: GitHub's `since` is inclusive, so the boundary issue is simply re-upserted
+        cursor = high_water_mark or coverage_start
+
+    url = f"{API_URL}/repos/{owner}/{repo}/issues"
+    # Oldest updates first, so every page boundary is a point in update time
+    params = {
+        "since": cursor,
+        "state": "all",
+        "sort": "updated",
+        "direction": "asc",
+        "per_page": 100
+    }
+
+    started = time.perf_counter()
+    sync_start = to_github_date(datetime.utcnow())
+    synced = {"pages": 0, "high_water_mark": None}
+
+    def saved(page):
+        # Everything saved before an error is kept
+        store.save_page(owner, repo, page)
+        synced["pages"] += 1
+        if page:
+            synced["high_water_mark"] = max(synced["high_water_mark"] or "", page[-1]["updated_at"])
+        inc("github_pages_total")
+        inc("github_issues_synced_total", len(page))
+        return page
+
+    # (first, last) update time of each non-empty page, in page order
+    bounds = []
+    for response in iter_pages(url, params, tokens):
+        raise_for_github_status(response, "issues")
+        if not bounds:
+            sync_start = server_time(response) or sync_start
+        page = saved(response.json())
+        if page:
+            bounds.append((page[0]["updated_at"], page[-1]["updated_at"]))
+        yield page
+
+    if len(bounds) > 1:
+        moved = False
+        for page in iter_keyset_pages(url, {**params, "since": sync_start}, tokens):
+            # Issues created since only join the end; older ones left a gap where they were
+            moved = moved or any(issue["created_at"] < sync_start for issue in page)
+            yield saved(page)
+        if moved:
+            # The issue after a gap slides into the page before it, which may already be fetched;
+            # whatever slid sits between one page's last update time and the next page's first
+            def reread(boundary):
+                (_, last), (first, _) = boundary
+                return list(iter_keyset_pages(url, {**params, "since": last}, tokens, until=first))
+
+            with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as pool:
+                for pages in pool.map(reread, zip(bounds, bounds[1:])):
+                    for page in pages:
+                        yield saved(page)
+
+    if synced["high_water_mark"]:
+        store.advance_high_water_mark(owner, repo, synced["high_water_mark"])
+    store.mark_synced(owner, repo, coverage_start)
+    # Includes the time the consumer spent on each page, i.e. how long the sync kept the fetch open
+    observe("github_sync_seconds", time.perf_counter() - started)
+    log_event("github_sync", repo=f"{owner}/{repo}", since=cursor, pages=synced["pages"])
+
+
+def sync_github_issues(owner, repo, since_date, tokens):
+    """Run a full sync of the local issue store without keeping the pages."""
+    for _ in iter_synced_pages(owner, repo, since_date, tokens):
+        pass
+
+
+def counted_issues(issues, stats):
+    """Pass raw issues through while counting them into `stats`."""
+    for issue in issues:
+        stats.total += 1
+        # PRs have the "pull_request" key in the response
+        if "pull_request" in issue:
+            stats.pull_requests += 1
+        elif issue.get("state") == "open":
+            stats.open_issues += 1
+        elif issue.get("state") == "closed":
+            stats.closed_issues += 1
+        yield issue
+
+
+def in_range(issue, since, until, wanted_labels):
+    return (
+        since <= issue.get("created_at", "") <= until
+        and wanted_labels.issubset(label["name"] for label in issue.get("labels", []))
+    )
+
+
+def backfilled_issues(pages, since, until, wanted_labels):
+    """Yield in-range issues from backfill pages, once each even if an issue moved between pages."""
+    seen = set()
+    for page in pages:
+        for issue in page:
+            if issue["number"] not in seen and in_range(issue, since, until, wanted_labels):
+                seen.add(issue["number"])
+                yield issue
+
+
+def is_open_issue(issue):
+    # PRs have the "pull_request" key in the response
+    return issue.get("state") == "open" and "pull_request" not in issue
+
+
+def iter_github_issues(owner, repo, since_date, until_date, labels=None, tokens=None, stats=None,
+                       open_only=False):
+    """Yield raw GitHub issues for the date range as soon as they are available.
+
+    A repo already synced back to `since_date` only downloads its delta and is then streamed
+    from the local index; otherwise issues are yielded page by page while the backfill runs.
+    With `open_only`, closed issues and PRs are counted into `stats` but not yielded.
+    Raises GitHubError if a request fails.
+    """
+    tokens = configured_tokens() if tokens is None else tokens
+    stats = stats if stats is not None else FetchStats()
+
+    # Convert `until_date` to naive datetime
+    until_date_dt = until_date.replace(tzinfo=None) if until_date.tzinfo else until_date
+    since, until = to_github_date(since_date), to_github_date(until_date_dt)
+    store = get_issue_store()
+
+    if store.covers(owner, repo, since):
+        sync_github_issues(owner, repo, since_date, tokens)
+        # Range, labels, state and PR filters run inside SQLite; only matching payloads are decoded
+        total, pull_requests, open_issues, closed_issues = store.count(owner, repo, since, until, labels)
+        stats.total += total
+        stats.pull_requests += pull_requests
+        stats.open_issues += open_issues
+        stats.closed_issues += closed_issues
+        yield from store.iter_query(owner, repo, since, until, labels, open_only=open_only)
+    else:
+        pages = iter_synced_pages(owner, repo, since_date, tokens)
+        issues = counted_issues(backfilled_issues(pages, since, until, set(labels or [])), stats)
+        yield from (issue for issue in issues if not open_only or is_open_issue(issue))
+
+
+def search_query(owner, repo, since, until, labels):
+    """Search API query for a repo's open issues (no PRs) created within [since, until]."""
+    qualifiers = [f"repo:{owner}/{repo}", "is:issue", "is:open", f"created:{since}..{until}"]
+    # Repeated label qualifiers must all match
+    qualifiers += [f'label:"{label}"' for label in labels or []]
+    return " ".join(qualifiers)
+
+
+def search_issue_pages(owner, repo, since_date, until_date, labels, tokens, stats):
+    """Yield search result pages newest first, splitting the range while it has too many results."""
+    since, until = to_github_date(since_date), to_github_date(until_date)
+    params = {
+        "q": search_query(owner, repo, since, until, labels),
+        "sort": "created",
+        "order": "desc",
+        "per_page": 100,
+    }
+    pages = iter_pages(f"{API_URL}/search/issues", params, tokens, SEARCH_PAGE_WORKERS, resource="search")
+
+    first = next(pages)
+    raise_for_github_status(first, "issues")
+    payload = first.json()
+    if payload["total_count"] > SEARCH_RESULT_LIMIT and until_date - since_date > timedelta(seconds=1):
+        # Only the first 1000 results are reachable, so search each half of the range on its own
+        pages.close()
+        middle = since_date + (until_date - since_date) / 2
+        yield from search_issue_pages(owner, repo, middle + timedelta(seconds=1), until_date, labels, tokens, stats)
+        yield from search_issue_pages(owner, repo, since_date, middle, labels, tokens, stats)
+        return
+
+    if payload.get("incomplete_results"):
+        stats.warnings.append(f"GitHub search timed out for {since}..{until}; some issues may be missing.")
+        logger.warning(stats.warnings[-1])
+    inc("github_search_pages_total")
+    yield payload["items"]
+    for response in pages:
+        raise_for_github_status(response, "issues")
+        inc("github_search_pages_total")
+        yield response.json()["items"]
+
+
+def iter_github_issues_search(owner, repo, since_date, until_date, labels=None, tokens=None, stats=None):
+    """Yield open issues in the date range from the Search API.
+
+    State, PR exclusion, date range and labels are all applied by GitHub, so only the issues
+    that are kept get downloaded. Results bypass the local issue store, whose sync state
+    assumes complete `state=all` pages.
+    """
+    tokens = configured_tokens() if tokens is None else tokens
+    stats = stats if stats is not None else FetchStats()
+
+    # Convert `until_date` to naive datetime
+    until_date_dt = until_date.replace(tzinfo=None) if until_date.tzinfo else until_date
+    pages = search_issue_pages(owner, repo, since_date, until_date_dt, labels, tokens, stats)
+    yield from counted_issues((issue for page in pages for issue in page), stats)
+
+
+def fetch_github_issues(owner, repo, since_date, until_date, labels=None, tokens=None):
+    """Sync GitHub issues into the local store and serve the date range from it."""
+    return list(iter_github_issues(owner, repo, since_date, until_date, labels, tokens))
+
+
+def relevant_labels(labels):
+    """Narrow a repo's labels to the triage-relevant ones, or keep all if none match."""
+    relevant_keywords = ['bug', 'priority', 'kind', 'enhancement', 'help wanted', 'good first issue']
+    relevant = [label for label in labels if any(keyword in label.lower() for keyword in relevant_keywords)]
+    return relevant if relevant else labels
+
+
+def fetch_owner_repos(owner, tokens=None, include_forks=False, include_archived=False, wait=True):
+    """Names of an organization's or user's repositories that have open issues, busiest first.
+
+    Starting with the busiest repos keeps them from being the last ones still fetching.
+    `wait=False` raises RateLimitError instead of pausing for a rate-limit reset.
+    """
+    tokens = configured_tokens() if tokens is None else tokens
+    listings = (
+        (f"{API_URL}/orgs/{owner}/repos", {"type": "all", "per_page": 100}),
+        # Not an organization, so list the user's own repos instead
+        (f"{API_URL}/users/{owner}/repos", {"type": "owner", "per_page": 100}),
+    )
+    for url, params in listings:
+        repos = []
+        for response in iter_pages(url, params, tokens, cache=True, wait=wait):
+            if response.status_code == 404:
+                break
+            raise_for_github_status(response, "repositories")
+            repos.extend(
+                repo for repo in response.json()
+                if repo.get("has_issues", True) and repo.get("open_issues_count", 1) > 0
+                and (include_forks or not repo.get("fork")) and (include_archived or not repo.get("archived"))
+            )
+        else:
+            repos.sort(key=lambda repo: repo.get("open_issues_count", 0), reverse=True)
+            return [repo["name"] for repo in repos]
+    raise GitHubError(f"No organization or user named {owner}", 404)
+
+
+def fetch_owner_labels(owner, repos, tokens=None, max_workers=REPO_FETCH_WORKERS, wait=True):
+    """The labels of several repositories, fetched concurrently and merged."""
+    tokens = configured_tokens() if tokens is None else tokens
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        label_lists = list(pool.map(lambda repo: fetch_repo_labels(owner, repo, tokens, wait), repos))
+    return sorted({label for labels in label_lists for label in labels})
+
+
+def fetch_repo_labels(owner, repo, tokens=None, wait=True):
+    """Fetch every label name of a repo; `wait=False` raises RateLimitError instead of pausing."""
+    tokens = configured_tokens() if tokens is None else tokens
+    url = f"{API_URL}/repos/{owner}/{repo}/labels"
+    labels = []
+
+    for response in iter_pages(url, {"per_page": 100}, tokens, cache=True, wait=wait):
+        raise_for_github_status(response, "labels")
+        labels.extend([label['name'] for label in response.json()])
+
+    return labels
+
+
+# Only the fields format_issues() reads; PRs and closed issues are excluded by the connection itself
+GRAPHQL_ISSUES_QUERY = """
+query($owner: String!, $repo: String!, $cursor: String, $labels: [String!]) {
+  repository(owner: $owner, name: $repo) {
+    issues(first: 100, after: $cursor, states: OPEN, labels: $labels,
+           orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        body
+        createdAt
+        state
+        url
+        labels(first: 50) { nodes { name } }
+      }
+    }
+  }
+}
+"""
+
+
+def iter_github_issues_graphql(owner, repo, since_date, until_date, labels=None, tokens=None, stats=None):
+    """Yield open issues in the date range from the GraphQL API."""
+    tokens = configured_tokens() if tokens is None else tokens
+    stats = stats if stats is not None else FetchStats()
+
+    if not tokens:
+        stats.warnings.append("The GraphQL API needs a Personal Access Token. Falling back to the REST API.")
+        logger.warning(stats.warnings[-1])
+        yield from iter_github_issues(owner, repo, since_date, until_date, labels, tokens, stats)
+        return
+
+    # Convert `until_date` to naive datetime
+    until_date_dt = until_date.replace(tzinfo=None) if until_date.tzinfo else until_date
+    since, until = to_github_date(since_date), to_github_date(until_date_dt)
+    wanted = set(labels or [])
+
+    variables = {
+        "owner": owner,
+        "repo": repo,
+        "cursor": None,
+        # GitHub matches any of these labels; requiring all of them is checked below
+        "labels": list(wanted) or None,
+    }
+    yield from counted_issues(graphql_issue_pages(variables, tokens, since, until, wanted), stats)
+
+
+def graphql_issue_pages(variables, tokens, since, until, wanted):
+    while True:
+        response = get_github_client().graphql(GRAPHQL_ISSUES_QUERY, variables, tokens)
+        raise_for_github_status(response, "issues")
+
+        payload = response.json()
+        if payload.get("errors"):
+            error = payload["errors"][0]
+            if error.get("type") == "RATE_LIMITED":
+                raise RateLimitError("Rate limit exceeded")
+            raise GitHubError(f"GraphQL query failed: {error.get('message')}")
+
+        connection = payload["data"]["repository"]["issues"]
+        for node in connection["nodes"]:
+            # Newest first, so the first issue older than the range ends the walk
+            if node["createdAt"] < since:
+                return
+            issue_labels = [label["name"] for label in node["labels"]["nodes"]]
+            if node["createdAt"] > until or not wanted.issubset(issue_labels):
+                continue
+            yield {
+                "number": node["number"],
+                "title": node["title"],
+                "body": node["body"],
+                "created_at": node["createdAt"],
+                "state": node["state"].lower(),
+                "html_url": node["url"],
+                "labels": [{"name": name} for name in issue_labels],
+            }
+
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        variables["cursor"] = connection["pageInfo"]["endCursor"]
+
+
+def iter_formatted_issues(issues, owner, repo) -> Iterator[FormattedIssue]:
+    """Formats open, non-PR issues into structured dictionaries one at a time."""
+    for issue in issues:
+        if is_open_issue(issue):
+            yield {
+                "number": issue.get("number"),
+                "title": issue.get("title"),
+                "description": issue.get("body", "(No description provided)"),
+                "created_at": issue.get("created_at", ""),
+                "url": f"https://github.com/{owner}/{repo}/issues/{issue.get('number')}",
+                "labels": [label['name'] for label in issue.get('labels', [])]
+            }
+
+
+# Ways to fetch a repo's issues: "rest" syncs the local index, "search" narrows on GitHub's side,
+# "graphql" walks open issues only; all take (owner, repo, since, until, labels, tokens, stats)
+FETCHERS = {
+    "rest": lambda *args: iter_github_issues(*args, open_only=True),
+    "search": iter_github_issues_search,
+    "graphql": iter_github_issues_graphql,
+}
+
+
+def format_issues(issues, owner, repo) -> List[FormattedIssue]:
+    """Formats issues into a structured dictionary."""
+    return list(iter_formatted_issues(issues, owner, repo))
+
+
+def iter_owner_issues(owner, repos, since_date, until_date, labels=None, tokens=None, api="rest",
+                      progress=None, stats=None, max_workers=REPO_FETCH_WORKERS):
+    """Yield formatted issues from several repositories of one owner, in the order they arrive.
+
+    Repositories are fetched concurrently with the FETCHERS entry for `api`, through the shared
+    GitHub client, so they draw on one connection pool and one rate-limit budget. `progress` maps
+    each repo to its RepoProgress; a repo that fails is recorded there and doesn't stop the rest.
+    `stats` receives the combined counts once every repo is done.
+    """
+    tokens = configured_tokens() if tokens is None else tokens
+    progress = progress if progress is not None else {}
+    for repo in repos:
+        progress.setdefault(repo, RepoProgress(repo))
+    arrived = queue.Queue()
+    stopped = threading.Event()
+    finished = object()
+
+    def fetch(repo):
+        entry = progress[repo]
+        entry.state = "fetching"
+        try:
+            raw_issues = FETCHERS[api](owner, repo, since_date, until_date, labels, tokens, entry.stats)
+            for issue in iter_formatted_issues(raw_issues, owner, repo):
+                if stopped.is_set():
+                    return
+                arrived.put(issue)
+                entry.issues += 1
+            entry.state = "done"
+        except Exception as e:
+            logger.warning("Fetching %s/%s failed: %s", owner, repo, e)
+            entry.error = str(e)
+            entry.state = "failed"
+        finally:
+            arrived.put(finished)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="repo-fetch")
+    try:
+        for repo in repos:
+            pool.submit(fetch, repo)
+        remaining = len(repos)
+        while remaining:
+            item = arrived.get()
+            if item is finished:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if stats is not None:
+        for entry in progress.values():
+            stats.total += entry.stats.total
+            stats.pull_requests += entry.stats.pull_requests
+            stats.open_issues += entry.stats.open_issues
+            stats.closed_issues += entry.stats.closed_issues
+            stats.warnings.extend(f"{entry.repo}: {warning}" for warning in entry.stats.warnings)
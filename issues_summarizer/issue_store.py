@@ -0,0 +1,191 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+from summary_cache import CACHE_DIR
+
+GITHUB_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def to_github_date(value):
+    """Formats a naive UTC datetime the way GitHub timestamps sort lexicographically."""
+    return value.strftime(GITHUB_DATE_FORMAT)
+
+
+def slim_issue(issue):
+    """Keeps only the issue fields the app reads, to keep the store small on big repos."""
+    slim = {
+        "number": issue.get("number"),
+        "title": issue.get("title"),
+        "body": issue.get("body"),
+        "created_at": issue.get("created_at", ""),
+        "updated_at": issue.get("updated_at", ""),
+        "state": issue.get("state"),
+        "labels": [{"name": label["name"]} for label in issue.get("labels", [])],
+    }
+    if "pull_request" in issue:
+        slim["pull_request"] = True
+    return slim
+
+
+class IssueStore:
+    """Local SQLite index of GitHub issues with a per-repo sync cursor."""
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "issues.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS issues (
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                state TEXT,
+                is_pr INTEGER NOT NULL,
+                labels TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (owner, repo, number)
+            );
+            CREATE INDEX IF NOT EXISTS issues_updated ON issues (owner, repo, updated_at);
+            CREATE INDEX IF NOT EXISTS issues_created ON issues (owner, repo, created_at);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                coverage_start TEXT,
+                high_water_mark TEXT,
+                synced_at REAL,
+                PRIMARY KEY (owner, repo)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get_sync_state(self, owner, repo):
+        """Returns (coverage_start, high_water_mark) for a repo, or (None, None) if never synced."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT coverage_start, high_water_mark FROM sync_state WHERE owner = ? AND repo = ?",
+                (owner, repo),
+            ).fetchone()
+        return row if row else (None, None)
+
+    def save_page(self, owner, repo, issues):
+        """Upserts one page of raw issues."""
+        rows = []
+        for issue in issues:
+            issue = slim_issue(issue)
+            labels = [label["name"] for label in issue["labels"]]
+            rows.append((
+                owner, repo, issue["number"], issue["updated_at"], issue["created_at"], issue["state"],
+                int("pull_request" in issue), json.dumps(labels), json.dumps(issue),
+            ))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO issues"
+                " (owner, repo, number, updated_at, created_at, state, is_pr, labels, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def advance_high_water_mark(self, owner, repo, high_water_mark):
+        """Records that every issue updated up to `high_water_mark` is in the store."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (owner, repo, high_water_mark) VALUES (?, ?, ?)"
+                " ON CONFLICT (owner, repo) DO UPDATE SET"
+                " high_water_mark = MAX(COALESCE(high_water_mark, ''), excluded.high_water_mark)",
+                (owner, repo, high_water_mark),
+            )
+            self._conn.commit()
+
+    def mark_synced(self, owner, repo, coverage_start):
+        """Records that every issue updated since coverage_start is now in the store."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (owner, repo, coverage_start, synced_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (owner, repo) DO UPDATE SET"
+                " coverage_start = MIN(COALESCE(coverage_start, excluded.coverage_start), excluded.coverage_start),"
+                " synced_at = excluded.synced_at",
+                (owner, repo, coverage_start, time.time()),
+            )
+            self._conn.commit()
+
+    def covers(self, owner, repo, since):
+        """True if every issue updated since `since` has been synced at least once."""
+        coverage_start, _ = self.get_sync_state(owner, repo)
+        return coverage_start is not None and coverage_start <= since
+
+    @staticmethod
+    def _where(owner, repo, created_from, created_to, labels):
+        """WHERE clause and parameters for the range and labels, evaluated inside SQLite."""
+        wanted = sorted(set(labels or []))
+        sql = " WHERE owner = ? AND repo = ? AND created_at >= ? AND created_at <= ?"
+        params = [owner, repo, created_from, created_to]
+        if wanted:
+            sql += (
+                " AND (SELECT COUNT(DISTINCT value) FROM json_each(issues.labels)"
+                f" WHERE value IN ({', '.join('?' * len(wanted))})) = ?"
+            )
+            params += wanted + [len(wanted)]
+        return sql, params
+
+    def count(self, owner, repo, created_from, created_to, labels=None):
+        """Returns (total, pull_requests, open_issues, closed_issues) for the range and labels."""
+        where, params = self._where(owner, repo, created_from, created_to, labels)
+        sql = (
+            "SELECT COUNT(*), COALESCE(SUM(is_pr), 0),"
+            " COALESCE(SUM(NOT is_pr AND state = 'open'), 0), COALESCE(SUM(NOT is_pr AND state = 'closed'), 0)"
+            " FROM issues" + where
+        )
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def iter_query(self, owner, repo, created_from, created_to, labels=None, batch_size=500, open_only=False):
+        """Yields stored issues created within the range, newest first, matching all given labels.
+
+        With `open_only`, closed issues and pull requests are skipped in SQL rather than decoded
+        and dropped later. Rows are read in batches, so memory stays flat however many match.
+        """
+        where, params = self._where(owner, repo, created_from, created_to, labels)
+        if open_only:
+            where += " AND state = 'open' AND is_pr = 0"
+        sql = "SELECT payload FROM issues" + where + " ORDER BY created_at DESC"
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute(sql, params)
+
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for (payload,) in rows:
+                yield json.loads(payload)
+
+    def query(self, owner, repo, created_from, created_to, labels=None):
+        """Returns stored issues created within the range, newest first, matching all given labels."""
+        return list(self.iter_query(owner, repo, created_from, created_to, labels))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_issue_store():
+    """Returns the process-wide issue store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IssueStore()
+        return _store
@@ -0,0 +1,242 @@
+import os
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from digest import IssueCluster, cluster_issues
+from github_issues import FETCHERS, FetchStats, GitHubError, RepoProgress, iter_formatted_issues, iter_owner_issues
+from model_lifecycle import get_model_manager
+from models import get_model
+from search_index import get_search_index
+from summarizer import DEFAULT_MAX_WORKERS, SummaryProgress, issue_cache_key, issue_key, pack_cache_key
+from summarizer import stream_summaries, summarize_clusters, summarize_issues_packed
+from summary_cache import get_summary_cache
+
+# Jobs run side by side; each one also fans out to its own summary workers
+JOB_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", "2"))
+# Finished jobs kept in memory for sessions that are still showing them
+MAX_FINISHED_JOBS = int(os.getenv("SUMMARY_MAX_FINISHED_JOBS", "50"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """One fetch-and-summarize run, shared by every session asking for the same thing with the same tokens."""
+    id: str
+    key: Tuple
+    digest: bool = False
+    state: str = QUEUED
+    issues: List[dict] = field(default_factory=list)
+    # Keyed by summarizer.issue_key(), since issue numbers repeat across repositories
+    summaries: Dict[str, str] = field(default_factory=dict)
+    partial: Dict[str, str] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    # The summary_cache key each issue's summary has in this job, for trusting the search index's copy
+    summary_keys: Dict[str, str] = field(default_factory=dict)
+    clusters: Optional[List[IssueCluster]] = None
+    cluster_summaries: Dict[Tuple[str, ...], str] = field(default_factory=dict)
+    stats: FetchStats = field(default_factory=FetchStats)
+    # Per-repository progress when several repositories of an owner are fetched together
+    repos: Dict[str, RepoProgress] = field(default_factory=dict)
+    error: Optional[Exception] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED)
+
+    def view(self):
+        """A consistent copy of the job's progress, safe to render while the worker keeps writing."""
+        with self.lock:
+            return Job(
+                id=self.id, key=self.key, digest=self.digest, state=self.state, issues=list(self.issues),
+                summaries=dict(self.summaries), partial=dict(self.partial), errors=dict(self.errors),
+                summary_keys=dict(self.summary_keys),
+                clusters=list(self.clusters) if self.clusters is not None else None,
+                cluster_summaries=dict(self.cluster_summaries), stats=self.stats,
+                repos={name: replace(progress) for name, progress in self.repos.items()}, error=self.error,
+                created_at=self.created_at, finished_at=self.finished_at,
+            )
+
+
+def tokens_fingerprint(tokens):
+    """A non-secret digest of a token set; jobs are only shared between identical sets, so a
+    session never sees issues fetched with a PAT that can read more than its own."""
+    digest = hashlib.sha256()
+    for token in sorted(set(tokens or ())):
+        digest.update(token.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def job_key(owner, repo, since_date, until_date, labels, model_name, api, digest, packed=False, tokens=None):
+    return (owner, repo, str(since_date), str(until_date), tuple(sorted(labels or ())),
+            model_name, api, bool(digest), bool(packed), tokens_fingerprint(tokens))
+
+
+class JobQueue:
+    """Process-level worker pool and job table.
+
+    Streamlit re-runs the page script on every interaction, so summarizing inside the script
+    would restart on each click. Jobs run here instead and the page only polls them.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, owner, repo, since_date, until_date, labels, model_name, tokens,
+               api="rest", digest=False, max_workers=DEFAULT_MAX_WORKERS, packed=False, repos=None):
+        """Queues a job, or returns the unfinished one already doing the same work.
+
+        `api` picks the fetcher from github_issues.FETCHERS. With `packed`, short issues share
+        LLM requests and summaries arrive whole instead of streamed. With `repos`, those
+        repositories of `owner` are fetched together in place of `repo` and summarized as one set.
+        """
+        scope = tuple(repos) if repos is not None else repo
+        key = job_key(owner, scope, since_date, until_date, labels, model_name, api, digest, packed, tokens)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and not job.finished:
+                    return job
+            job = Job(id=uuid.uuid4().hex, key=key, digest=bool(digest))
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+
+        if repos is not None:
+            job.repos.update((name, RepoProgress(name)) for name in repos)
+            issues = iter_owner_issues(owner, repos, since_date, until_date, labels, tokens, api,
+                                       progress=job.repos, stats=job.stats)
+        else:
+            raw_issues = FETCHERS[api](owner, repo, since_date, until_date, labels, tokens, job.stats)
+            issues = iter_formatted_issues(raw_issues, owner, repo)
+        self._pool.submit(self._run, job, issues, model_name, digest, max_workers, packed)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _forget_old_jobs(self):
+        finished = []
+        for job in self._jobs.values():
+            # _run sets both fields together under the job's lock
+            with job.lock:
+                if job.finished:
+                    finished.append((job.finished_at, job.id))
+        finished.sort()
+        for _, job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, issues, model_name, digest, max_workers, packed=False):
+        with job.lock:
+            job.state = RUNNING
+        try:
+            # Sessions come and go while the job runs; its model stays loaded until it is done
+            with get_model_manager().holding(model_name):
+                llm = get_model(model_name)
+                if digest:
+                    self._run_digest(job, issues, llm, model_name, max_workers)
+                elif packed:
+                    self._run_packed(job, issues, llm, model_name, max_workers)
+                else:
+                    self._run_issues(job, issues, llm, model_name, max_workers)
+            state = DONE
+        except Exception as e:
+            logger.exception("Summary job %s failed", job.id)
+            with job.lock:
+                job.error = e
+            state = FAILED
+        with job.lock:
+            job.finished_at = time.time()
+            job.state = state
+
+    def _fetched(self, job, issues, cache_key=None):
+        """Records issues on the job and in the search index as they are fetched; a GitHub error
+        ends the fetch but keeps them. `cache_key(issue)` gives the summary_cache key the job's
+        summary of the issue will have."""
+        index = get_search_index()
+        try:
+            for issue in issues:
+                summary_key = cache_key(issue) if cache_key else None
+                index.add(issue)
+                with job.lock:
+                    job.issues.append(issue)
+                    if summary_key:
+                        job.summary_keys[issue_key(issue)] = summary_key
+                yield issue
+        except GitHubError as e:
+            with job.lock:
+                job.error = e
+
+    def _run_issues(self, job, issues, llm, model_name, max_workers):
+        index = get_search_index()
+        fetched = self._fetched(job, issues, lambda issue: issue_cache_key(issue, model_name))
+        for event in stream_summaries(llm, fetched, max_workers, cache=get_summary_cache(), model_name=model_name):
+            key = issue_key(event.issue)
+            with job.lock:
+                if isinstance(event, SummaryProgress):
+                    job.partial[key] = event.partial
+                    continue
+                job.partial.pop(key, None)
+                if event.error:
+                    job.errors[key] = str(event.error)
+                else:
+                    job.summaries[key] = event.summary
+            if not event.error:
+                index.set_summary(event.issue, event.summary, job.summary_keys[key])
+
+    def _run_packed(self, job, issues, llm, model_name, max_workers):
+        index = get_search_index()
+        fetched = self._fetched(job, issues, lambda issue: pack_cache_key(issue, model_name))
+        for issue, summary, error in summarize_issues_packed(llm, fetched, max_workers,
+                                                             cache=get_summary_cache(), model_name=model_name):
+            with job.lock:
+                if error:
+                    job.errors[issue_key(issue)] = str(error)
+                else:
+                    job.summaries[issue_key(issue)] = summary
+            if not error:
+                index.set_summary(issue, summary, job.summary_keys[issue_key(issue)])
+
+    def _run_digest(self, job, issues, llm, model_name, max_workers):
+        # Grouping needs every issue up front. A group's summary is no summary of its members,
+        # so none go into the search index.
+        clusters = cluster_issues(self._fetched(job, issues))
+        with job.lock:
+            job.clusters = clusters
+        for cluster, summary, error in summarize_clusters(llm, clusters, max_workers,
+                                                          cache=get_summary_cache(), model_name=model_name):
+            members = tuple(issue_key(issue) for issue in cluster.issues)
+            with job.lock:
+                if error:
+                    job.errors[members[0]] = str(error)
+                else:
+                    job.cluster_summaries[members] = summary
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the process-wide job queue shared by all Streamlit sessions."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -1,16 +1,30 @@
 import os
+import uuid
 import base64
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import streamlit as st
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_community.llms import Ollama, OpenAI
-from huggingface_hub import InferenceClient
 
 from Extract_owner_and_repo_name import get_owner_repo_from_url, get_date_range_from_user
-from fetching_issues import fetch_github_issues, format_issues, fetch_github_labels
-from export_summaries import export_summaries
+from fetching_issues import check_rate_limit, fetch_github_labels, github_tokens, report_github_error, show_fetch_details
+from fetching_issues import fetch_github_owner_labels, fetch_github_owner_repos
+from github_issues import GitHubError
+from jobs import get_job_queue
+from metrics import configure_logging, serve_metrics
+from model_lifecycle import FAILED, LOADING, READY, get_model_manager
+from search_index import get_search_index
+from summarizer import DEFAULT_MAX_WORKERS, issue_key, issue_repo
+from summary_cache import get_summary_cache
+
+# Seconds between refreshes of the summaries column while a job is running
+JOB_POLL_INTERVAL = float(os.getenv("SUMMARY_JOB_POLL_INTERVAL", "1"))
+# Seconds between refreshes of the model load state
+MODEL_STATE_POLL_INTERVAL = float(os.getenv("MODEL_STATE_POLL_INTERVAL", "2"))
+# Issues rendered per page of results
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", "25"))
+SORT_LABELS = {"newest": "Newest first", "oldest": "Oldest first", "number": "Issue number", "relevance": "Best match"}
+SUMMARY_FILTERS = {"Any": None, "Summarized": True, "Not summarized": False}
+REPO_STATES = {"queued": "⏳ queued", "fetching": "🔄 fetching", "done": "✅ done", "failed": "❌ failed"}
 
 st.set_page_config(
     page_title="IssueLenz",
@@ -21,6 +35,8 @@ st.set_page_config(
 )
 
 load_dotenv()
+configure_logging()
+serve_metrics()
 
 # Ensure session state for models persists
 if "models" not in st.session_state:
@@ -29,42 +45,149 @@ if "models" not in st.session_state:
 if "persisted_models" in st.session_state:
     st.session_state.models = st.session_state["persisted_models"]
 
-@st.cache_resource
-def get_model(model_name):
-    prefix, actual_model_name = model_name.split("->", 1) if "->" in model_name else (None, model_name)
-    if prefix == "gpt":
-        return OpenAI(temperature=0.7, api_key=os.getenv("OPENAI_API_KEY"))
-    elif prefix == "hf":
-        return InferenceClient(model=actual_model_name, token=os.getenv("HF_API_KEY"))
-    elif prefix == "ds" or actual_model_name.startswith(("llama", "deepseek")):
-        return Ollama(model=actual_model_name)
+# Identifies this browser session to the model manager, which is shared by all of them
+st.session_state.setdefault("session_key", uuid.uuid4().hex)
+
+@st.fragment(run_every=MODEL_STATE_POLL_INTERVAL)
+def show_model_state(model_name):
+    manager = get_model_manager()
+    # Polling doubles as this session's heartbeat, so the models of closed tabs can be unloaded
+    manager.touch(st.session_state.session_key)
+    state, detail = manager.state(model_name)
+    if state == READY:
+        st.caption(f"🟢 Model loaded ({detail})")
+    elif state == LOADING:
+        st.caption("⏳ Loading model in the background...")
+    elif state == FAILED:
+        st.caption(f"🔴 Model failed to load: {detail}")
     else:
-        raise ValueError(f"Invalid model: {model_name}")
+        st.caption("⚪ Model not loaded")
 
+def render_issue(placeholder, issue, summary, show_repo=False):
+    with placeholder.container():
+        repo_prefix = f"{issue_repo(issue)} " if show_repo else ""
+        st.markdown(f"### {repo_prefix}Issue #{issue['number']}: {issue['title']}")
+        st.markdown(f"Labels: {', '.join(issue['labels']) if issue['labels'] else 'No label'}")
+        st.markdown(f"Summary: {summary}")
+        st.markdown(f"[View Issue on GitHub]({issue['url']})")
+        st.write("---")
 
-@st.cache_data(persist=True)
-def get_summary(issue_number: int, repo_name: str, model_name: str):
-    llm = get_model(model_name)
-    issue_text = next((issue for issue in st.session_state.formatted_issues if issue['number'] == issue_number), None)
-    if not issue_text:
-        return "No issue text found."
+def render_cluster(placeholder, cluster, summary):
+    representative = cluster.issues[0]
+    if len(cluster.issues) == 1:
+        render_issue(placeholder, representative, summary)
+        return
+    with placeholder.container():
+        st.markdown(f"### {len(cluster.issues)} similar issues: {representative['title']}")
+        st.markdown(f"Summary: {summary}")
+        st.markdown("\n".join(f"- [{issue_repo(issue)}#{issue['number']}: {issue['title']}]({issue['url']})"
+                               for issue in cluster.issues))
+        st.write("---")
 
-    issue_text_str = (
-        f"Issue #{issue_text['number']}: {issue_text['title']}\n"
-        f"Description: {issue_text['description']}\n"
-        f"Created At: {issue_text['created_at']}\n"
-        f"Labels: {', '.join(issue_text['labels']) if issue_text['labels'] else 'No label'}"
-    )
+def render_results(job):
+    """Searches, filters and sorts a job's issues in the local index and renders one page of them."""
+    if not job.issues:
+        return
+    index = get_search_index()
+    show_repo = len({issue_repo(issue) for issue in job.issues}) > 1
 
-    if isinstance(llm, InferenceClient):
-        return llm.text_generation(issue_text_str, max_length=200)
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant. Summarize the issue clearly and also suggest solution for it."),
-        #("system", "You are a helpful assistant. Summarize the GitHub issue clearly, and also suggest a possible solution or next step to resolve it."),
-        ("user", "{issues}")
-    ])
-    return (prompt | llm | StrOutputParser()).invoke({"issues": issue_text_str}).strip()
+    search_col, sort_col = st.columns([3, 1])
+    text = search_col.text_input("Search issues:", placeholder="Words from titles, descriptions, labels or summaries",
+                                 key="results_text")
+    sort = sort_col.selectbox("Sort by:", list(SORT_LABELS), format_func=SORT_LABELS.get, key="results_sort")
+    label_col, summary_col = st.columns([3, 1])
+    label_counts = dict(index.labels(job.issues))
+    filter_labels = label_col.multiselect("Filter by label:", list(label_counts),
+                                          format_func=lambda label: f"{label} ({label_counts.get(label, 0)})",
+                                          key="results_labels")
+    summary_filter = summary_col.selectbox("Summary:", list(SUMMARY_FILTERS), key="results_summary")
+
+    # Back to the first page whenever the query changes
+    query = (job.id, text, sort, tuple(filter_labels), summary_filter)
+    if st.session_state.get("results_query") != query:
+        st.session_state.results_query = query
+        st.session_state.results_page = 0
+    page = st.session_state.results_page
+
+    def search(page):
+        return index.search(job.issues, text, filter_labels, SUMMARY_FILTERS[summary_filter], sort,
+                            limit=RESULTS_PAGE_SIZE, offset=page * RESULTS_PAGE_SIZE, summary_keys=job.summary_keys)
+
+    results = search(page)
+    pages = max(1, -(-results.total // RESULTS_PAGE_SIZE))
+    if page >= pages:
+        # Fewer matches than when the page was picked, e.g. as summaries arrive
+        page = st.session_state.results_page = pages - 1
+        results = search(page)
+    if not results.total:
+        st.info("No issues match the search.")
+
+    for issue in results.issues:
+        key = issue_key(issue)
+        # The job is fresher than the index while summaries are still streaming in; the index
+        # only returns summaries made under this job's cache keys
+        if key in job.summaries:
+            summary = job.summaries[key]
+        elif key in job.errors:
+            summary = f"⚠️ Failed to summarize: {job.errors[key]}"
+        elif key in job.partial:
+            summary = f"{job.partial[key]} ▌"
+        else:
+            summary = issue['summary'] or "⏳ Summarizing..."
+        render_issue(st.empty(), issue, summary, show_repo)
+
+    def go_to(page):
+        st.session_state.results_page = page
+
+    previous_col, position_col, next_col = st.columns([1, 2, 1])
+    previous_col.button("◀ Previous", disabled=page == 0, on_click=go_to, args=(page - 1,))
+    position_col.caption(f"Page {page + 1} of {pages} · {results.total} matching issues")
+    next_col.button("Next ▶", disabled=page + 1 >= pages, on_click=go_to, args=(page + 1,))
+
+def render_repo_progress(job):
+    """Per-repository fetch progress of an owner-wide job."""
+    done = sum(progress.state in ("done", "failed") for progress in job.repos.values())
+    with st.expander(f"Repositories: {done} of {len(job.repos)} fetched", expanded=not job.finished):
+        st.dataframe([
+            {"Repository": name, "State": REPO_STATES.get(progress.state, progress.state),
+             "Issues": progress.issues, "Error": progress.error or ""}
+            for name, progress in job.repos.items()
+        ], hide_index=True)
+
+def show_job(job_id, polling):
+    """Progress and results of a job.
+
+    While `polling`, this runs as a fragment every JOB_POLL_INTERVAL seconds, so only the
+    summaries column is redrawn, and reruns the whole page once when the job finishes.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return
+    job = job.view()
+    if polling and job.finished:
+        st.rerun()
+
+    if job.repos:
+        render_repo_progress(job)
+
+    if job.clusters is not None:
+        st.caption(f"Digest: {len(job.issues)} issues in {len(job.clusters)} groups")
+        for cluster in job.clusters:
+            members = tuple(issue_key(issue) for issue in cluster.issues)
+            if members in job.cluster_summaries:
+                summary = job.cluster_summaries[members]
+            elif members[0] in job.errors:
+                summary = f"⚠️ Failed to summarize: {job.errors[members[0]]}"
+            else:
+                summary = "⏳ Summarizing..."
+            render_cluster(st.empty(), cluster, summary)
+    elif job.digest:
+        st.info(f"⏳ Fetching issues to group... {len(job.issues)} so far")
+    else:
+        render_results(job)
+
+    if not job.finished:
+        st.caption(f"⏳ Job {job.state}: {len(job.summaries)} of {len(job.issues)} issues summarized")
 
 # Initialize session state variables if not already set
 for key in ["summarized_issues", "formatted_issues", "fetch_clicked"]:
@@ -96,47 +219,113 @@ col1, col2 = st.columns([1, 2])
 with col1:
     st.markdown("""<div style="background-color: #f4f4f4; padding: 20px; border-radius: 10px;"><h2>🔍 Input Section</h2>""", unsafe_allow_html=True)
     
-    selected_model = st.selectbox("Choose Model", st.session_state.models, index=0)
+    # A model saved on the settings page becomes the selected one
+    active_model = st.session_state.get("active_model")
+    model_index = st.session_state.models.index(active_model) if active_model in st.session_state.models else 0
+    selected_model = st.selectbox("Choose Model", st.session_state.models, index=model_index)
     
     if selected_model == "Custom model":
         st.switch_page("pages/⚙️_Custom_Model_Settings.py")
+
+    # Loads the model before the first summary needs it, and unloads the one switched away from
+    st.session_state.active_model = selected_model
+    get_model_manager().select(st.session_state.session_key, selected_model)
+    show_model_state(selected_model)
     
-    repo_url = st.text_input("Repository link:", placeholder="Enter Github Repo Link")
-    owner, repo = get_owner_repo_from_url(repo_url) if repo_url else (None, None)
-    
-    labels = fetch_github_labels(owner, repo) if owner and repo else None
+    owner_mode = st.toggle("All repositories of an organization or user")
+    selected_repos = None
+    if owner_mode:
+        owner = st.text_input("Organization or user:", placeholder="e.g. kubernetes or https://github.com/kubernetes")
+        owner = owner.strip().rstrip("/").split("/")[-1] if owner.strip() else None
+        repo = None
+        owner_repos = fetch_github_owner_repos(owner) if owner else []
+        skipped_repos = st.multiselect("Skip repositories (Optional):", options=owner_repos) if owner_repos else []
+        selected_repos = [name for name in owner_repos if name not in skipped_repos]
+        if owner_repos:
+            st.caption(f"{len(selected_repos)} repositories with open issues will be fetched together")
+        labels = fetch_github_owner_labels(owner, selected_repos) if selected_repos else None
+    else:
+        repo_url = st.text_input("Repository link:", placeholder="Enter Github Repo Link")
+        owner, repo = get_owner_repo_from_url(repo_url) if repo_url else (None, None)
+
+        labels = fetch_github_labels(owner, repo) if owner and repo else None
     selected_labels = st.multiselect("Labels (Optional):", options=labels) if labels else None
     
     start_date, end_date = get_date_range_from_user(owner, repo)
     if start_date > end_date:
         st.error("Start date cannot be later than end date!")
     
-    export_format = st.selectbox("Choose export format:", ["None", "Excel", "Word", "JSON"])
+    export_format = st.selectbox("Choose export format:", ["None", "Excel", "Word", "JSON", "NDJSON", "CSV", "Parquet"])
+
+    max_workers = st.number_input("Parallel summaries:", min_value=1, max_value=32, value=DEFAULT_MAX_WORKERS)
+
+    api_modes = {
+        "rest": "REST (syncs a local index, fastest on repeat fetches)",
+        "search": "Search (filtered by GitHub, fastest on old, busy repos)",
+        "graphql": "GraphQL (open issues only, needs a PAT)",
+    }
+    default_mode = os.getenv("GITHUB_API_MODE", "rest")
+    api_mode = st.radio("GitHub API:", list(api_modes), format_func=api_modes.get,
+                        index=list(api_modes).index(default_mode) if default_mode in api_modes else 0)
+
+    digest_mode = st.checkbox("Digest mode (one summary per group of similar issues)")
+
+    packed_mode = st.checkbox("Pack short issues into shared requests (faster on small local models)",
+                              value=os.getenv("SUMMARY_PACKING") == "1", disabled=digest_mode)
     
     if st.button("Fetch Issues"):
         st.session_state.fetch_clicked = True
-        st.session_state.formatted_issues = format_issues(fetch_github_issues(owner, repo, start_date, end_date, selected_labels), owner, repo) if owner and repo else []
+        if owner and (repo or selected_repos) and check_rate_limit():
+            # Summaries run in a background job that outlives reruns; sessions asking for the same
+            # repo, range and model share one job
+            job = get_job_queue().submit(owner, repo, start_date, end_date, selected_labels, selected_model,
+                                         github_tokens(), api_mode, digest_mode, max_workers,
+                                         packed=packed_mode, repos=selected_repos)
+            st.session_state.job_id = job.id
+    fetch_status = st.container()
 
 with col2:
     st.markdown("""<div style="background-color: #e6f7ff; padding: 20px; border-radius: 10px;"><h2>📜 Summaries</h2></div>""", unsafe_allow_html=True)
-    
-    if st.session_state.fetch_clicked and st.session_state.formatted_issues:
-        for issue in st.session_state.formatted_issues:
-            summary = st.session_state.summarized_issues.get(issue['number'], get_summary(issue['number'], repo, selected_model))
-            st.session_state.summarized_issues[issue['number']] = summary  
-            
-            st.markdown(f"### Issue #{issue['number']}: {issue['title']}")
-            st.markdown(f"Labels: {', '.join(issue['labels']) if issue['labels'] else 'No label'}")
-            st.markdown(f"Summary: {summary}")
-            st.markdown(f"[View Issue on GitHub]({issue['url']})")
-            st.write("---")
-    
+
+    job = get_job_queue().get(st.session_state.get("job_id")) if st.session_state.fetch_clicked else None
+    if job is not None:
+        job = job.view()
+        st.session_state.formatted_issues = job.issues
+        st.session_state.summarized_issues = dict(job.summaries)
+        # Digest exports carry each group's summary on every member issue
+        for members, summary in job.cluster_summaries.items():
+            st.session_state.summarized_issues.update(dict.fromkeys(members, summary))
+
+        # Poll a running job in a fragment; rerunning the whole page would rebuild every widget
+        # and call GitHub again each time
+        polling = not job.finished
+        st.fragment(run_every=JOB_POLL_INTERVAL if polling else None)(show_job)(job.id, polling)
+
+        if job.finished:
+            if isinstance(job.error, GitHubError):
+                report_github_error(job.error, fetch_status)
+            elif job.error is not None:
+                fetch_status.error(f"❌ Summarization failed: {job.error}")
+            show_fetch_details(job.stats, fetch_status)
+            cache_stats = get_summary_cache().stats()
+            if job.issues:
+                st.caption(f"Summary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} stored")
+
     if st.session_state.fetch_clicked and st.session_state.formatted_issues:
         col3, col4 = st.columns([1, 1])
         with col3:
             if export_format != "None":
-                export_summaries(export_format, st.session_state.formatted_issues)
+                # The writers pull in openpyxl and python-docx; only load them once an export is wanted.
+                # The file is built on request and offered until the job or its summaries change
+                from export_summaries import export_summaries
+                version = (st.session_state.get("job_id"), len(st.session_state.formatted_issues),
+                           len(st.session_state.summarized_issues))
+                export_summaries(export_format, st.session_state.formatted_issues, st.session_state.summarized_issues,
+                                 version)
         with col4:
             if st.button("Clear All"):
+                # Keep the session key, so the model manager doesn't count this tab as a new session
+                session_key = st.session_state.session_key
                 st.session_state.clear()
+                st.session_state.session_key = session_key
                 st.rerun()
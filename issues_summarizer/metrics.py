@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "issuelenz_"
+# Histogram bucket bounds in seconds, from a cached GitHub page to a slow local model
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Per-call events are logged as JSON at DEBUG level
+logger = logging.getLogger("issuelenz.metrics")
+
+
+class Metrics:
+    """Process-wide counters, gauges and timers, labelled like Prometheus series."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._timers = {}  # key -> [count, total seconds, max seconds, per-bucket counts]
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            timer = self._timers.setdefault(key, [0, 0.0, 0.0, [0] * len(BUCKETS)])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timer[3][i] += 1
+        log_event(name, seconds=round(seconds, 4), **labels)
+
+    @contextmanager
+    def timed(self, name, **labels):
+        """Times the block; failures are timed too, and labelled with error="true"."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - started, error="true", **labels)
+            raise
+        self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """Plain-dict copy of every series, for display."""
+        with self._lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self._counters.items())],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in sorted(self._gauges.items())],
+                "timers": [{"name": name, "labels": dict(labels), "count": count, "total_seconds": total,
+                            "avg_seconds": total / count if count else 0.0, "max_seconds": longest}
+                           for (name, labels), (count, total, longest, _) in sorted(self._timers.items())],
+            }
+
+    def prometheus_text(self):
+        """Every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    for (series_name, labels), value in sorted(series.items()):
+                        if series_name == name:
+                            lines.append(f"{PREFIX}{name}{format_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self._timers}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (series_name, labels), (count, total, _, buckets) in sorted(self._timers.items()):
+                    if series_name != name:
+                        continue
+                    for bound, bucket_count in zip(BUCKETS, buckets):
+                        lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', str(bound)),))} {bucket_count}")
+                    lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {total}")
+                    lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + "}"
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({"event": event, **fields}, default=str))
+
+
+def token_label(token):
+    """A stable, non-secret name for a PAT in metric labels."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:8] if token else "anonymous"
+
+
+REGISTRY = Metrics()
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def configure_logging(level=None):
+    """Logs to stderr at LOG_LEVEL, e.g. DEBUG for the JSON events above, once per process.
+
+    Streamlit leaves the root logger at WARNING, so app logs need this to show. Does nothing
+    when LOG_LEVEL is unset or logging is already set up. Read at call time so a .env loaded
+    first applies.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "")).upper()
+    if not level or logging.getLogger().handlers:
+        return
+    if not isinstance(logging.getLevelName(level), int):
+        logger.warning("Ignoring unknown LOG_LEVEL %s", level)
+        return
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+
+def serve_metrics(port=None):
+    """Serves Prometheus text at http://host:METRICS_PORT/metrics, once per process.
+
+    Does nothing when METRICS_PORT is unset. Read at call time so a .env loaded first applies.
+    """
+    global _server
+    port = port or os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), MetricsHandler)
+            except OSError as e:
+                # Don't retry (and warn again) on every Streamlit rerun
+                logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+                _server = False
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server or None
@@ -0,0 +1,178 @@
+import os
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+
+from metrics import observe, set_gauge
+from models import get_model, ollama_model_name
+
+NOT_LOADED, LOADING, READY, FAILED = "not loaded", "loading", "ready", "failed"
+# Seconds without a rerun or poll after which a session counts as closed and stops holding its model
+SESSION_TTL = int(os.getenv("MODEL_SESSION_TTL", "900"))
+
+logger = logging.getLogger(__name__)
+
+
+def ollama_backends(llm):
+    """The Ollama clients behind a model router, one per endpoint; empty for other backends."""
+    from backends import PooledOllama
+
+    return [endpoint.llm for endpoint in getattr(llm, "endpoints", []) if isinstance(endpoint.llm, PooledOllama)]
+
+
+class ModelManager:
+    """Loads models ahead of the first summary and unloads Ollama models nobody is using.
+
+    Loading a model into Ollama can take longer than the summary itself, so it happens in the
+    background as soon as a model is picked. Sessions are tracked by key; a model is unloaded
+    once the last session using it switches away, or closes and isn't seen for SESSION_TTL,
+    and no background job is still summarizing with it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}  # model name -> (state, detail)
+        self._selected = {}  # session key -> (model name, last seen)
+        self._loads = {}  # model name -> token of the load in flight, dropped by unload()
+        self._held = {}  # model name -> number of running jobs using it
+
+    def state(self, model_name):
+        """Returns (state, detail), where detail is the load time or the error."""
+        with self._lock:
+            return self._states.get(model_name, (NOT_LOADED, None))
+
+    def states(self):
+        with self._lock:
+            return dict(self._states)
+
+    def warm(self, model_name):
+        """Starts loading a model in the background unless it is loaded or loading already."""
+        with self._lock:
+            if self._states.get(model_name, (NOT_LOADED,))[0] in (LOADING, READY):
+                return
+            self._states[model_name] = (LOADING, None)
+            self._loads[model_name] = load = object()
+        threading.Thread(target=self._load, args=(model_name, load), name=f"warm-{model_name}", daemon=True).start()
+
+    def _load(self, model_name, load):
+        started = time.perf_counter()
+        try:
+            backends = ollama_backends(get_model(model_name)) if ollama_model_name(model_name) else []
+            if backends:
+                # Every node serves requests, so every node loads the model
+                with ThreadPoolExecutor(max_workers=len(backends)) as pool:
+                    list(pool.map(lambda backend: backend.load(), backends))
+        except Exception as e:
+            logger.warning("Could not load model %s: %s", model_name, e)
+            state = (FAILED, str(e))
+        else:
+            seconds = time.perf_counter() - started
+            observe("model_warmup_seconds", seconds, model=model_name)
+            state = (READY, f"{seconds:.1f}s")
+        with self._lock:
+            current = self._loads.get(model_name) is load
+            if current:
+                del self._loads[model_name]
+                self._states[model_name] = state
+            # Unloaded meanwhile, and not picked again since
+            superseded = not current and model_name not in self._states
+        if superseded:
+            # The unload may have reached Ollama before this load did
+            if ollama_model_name(model_name):
+                self._unload(model_name)
+            return
+        set_gauge("model_loaded", int(state[0] == READY), model=model_name)
+
+    def select(self, session_key, model_name):
+        """Records the model a session uses, warming it and unloading the one it leaves behind."""
+        with self._lock:
+            previous = self._selected.get(session_key, (None, None))[0]
+            self._selected[session_key] = (model_name, time.time())
+            unused = self._unused({previous})
+        self.warm(model_name)
+        for unused_model in unused:
+            self.unload(unused_model)
+
+    def touch(self, session_key):
+        """Marks a session as still open, and unloads models only closed sessions were using."""
+        with self._lock:
+            if session_key in self._selected:
+                self._selected[session_key] = (self._selected[session_key][0], time.time())
+            unused = self._unused(set())
+        for unused_model in unused:
+            self.unload(unused_model)
+
+    @contextmanager
+    def holding(self, model_name):
+        """Counts a model as in use for the length of the block, e.g. a background job that
+        outlives the session that started it; unloads it afterwards if nobody else uses it."""
+        with self._lock:
+            self._held[model_name] = self._held.get(model_name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held[model_name] -= 1
+                if not self._held[model_name]:
+                    del self._held[model_name]
+                unused = self._unused({model_name})
+            for unused_model in unused:
+                self.unload(unused_model)
+
+    def _unused(self, candidates):
+        """Expires sessions not seen for SESSION_TTL; returns their models and the candidates that no
+        session uses any more. Call with the lock held."""
+        now = time.time()
+        for session_key, (model_name, seen) in list(self._selected.items()):
+            if now - seen > SESSION_TTL:
+                del self._selected[session_key]
+                candidates.add(model_name)
+        in_use = {model_name for model_name, _ in self._selected.values()} | set(self._held)
+        return {model_name for model_name in candidates if model_name and model_name not in in_use}
+
+    def refresh(self, model_name):
+        """Re-reads whether an Ollama model is still loaded, since keep_alive may have run out."""
+        if self.state(model_name)[0] != READY or not ollama_model_name(model_name):
+            return
+        try:
+            loaded = all(backend.is_loaded() for backend in ollama_backends(get_model(model_name)))
+        except requests.RequestException:
+            return
+        if not loaded:
+            with self._lock:
+                self._states[model_name] = (NOT_LOADED, None)
+            set_gauge("model_loaded", 0, model=model_name)
+
+    def unload(self, model_name):
+        """Frees an Ollama model on every endpoint in the background; other backends hold nothing."""
+        with self._lock:
+            self._states.pop(model_name, None)
+            # A load still in flight must not mark the model ready afterwards
+            self._loads.pop(model_name, None)
+        set_gauge("model_loaded", 0, model=model_name)
+        if ollama_model_name(model_name):
+            threading.Thread(target=self._unload, args=(model_name,), name=f"unload-{model_name}", daemon=True).start()
+
+    def _unload(self, model_name):
+        for backend in ollama_backends(get_model(model_name)):
+            try:
+                backend.unload()
+            except requests.RequestException as e:
+                logger.warning("Could not unload model %s from %s: %s", model_name, backend.base_url, e)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    """Returns the process-wide model manager shared by all Streamlit sessions."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ModelManager()
+        return _manager
@@ -0,0 +1,47 @@
+import os
+from functools import lru_cache
+
+from metrics import timed
+
+
+@lru_cache(maxsize=None)
+def get_model(model_name):
+    """Returns the LLM client for a model name, building each one once per process.
+
+    Backends are imported on first use, so code paths that never summarize don't pay for them.
+    """
+    with timed("model_load_seconds", model=model_name):
+        return build_model(model_name)
+
+
+def split_model_name(model_name):
+    """Returns (prefix, model) for names like "hf->org/model"; the prefix is None without one."""
+    return model_name.split("->", 1) if "->" in model_name else (None, model_name)
+
+
+def ollama_model_name(model_name):
+    """The Ollama model a model name is served by, or None for other backends."""
+    prefix, actual_model_name = split_model_name(model_name)
+    if prefix not in ("gpt", "hf") and (prefix == "ds" or actual_model_name.startswith(("llama", "deepseek"))):
+        return actual_model_name
+    return None
+
+
+def build_model(model_name):
+    prefix, actual_model_name = split_model_name(model_name)
+    if prefix == "gpt":
+        urls = os.getenv("OPENAI_BASE_URLS")
+        if urls:
+            from backends import endpoint_urls, openai_router
+            return openai_router(actual_model_name, endpoint_urls("OPENAI_BASE_URLS"), os.getenv("OPENAI_API_KEY"))
+        from langchain_community.llms import OpenAI
+        return OpenAI(temperature=0.7, api_key=os.getenv("OPENAI_API_KEY"))
+    elif prefix == "hf":
+        from huggingface_hub import InferenceClient
+        return InferenceClient(model=actual_model_name, token=os.getenv("HF_API_KEY"))
+    elif ollama_model_name(model_name):
+        # Routed over every endpoint in OLLAMA_URLS, so adding Ollama containers adds throughput
+        from backends import ollama_router
+        return ollama_router(actual_model_name)
+    else:
+        raise ValueError(f"Invalid model: {model_name}")
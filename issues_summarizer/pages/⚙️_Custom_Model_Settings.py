@@ -1,5 +1,8 @@
 import streamlit as st
 import os  
+import uuid
+
+from model_lifecycle import FAILED, LOADING, READY, get_model_manager
 
 # Page config
 st.set_page_config(
@@ -30,12 +33,20 @@ if "models" not in st.session_state:
 # Tabs for model selection
 tab1, tab2, tab3 = st.tabs(["GPT Integration", "Hugging Face Model", "Deepseek Model Integration"])
 
+st.session_state.setdefault("session_key", uuid.uuid4().hex)
+
 def add_model_to_session(model_with_prefix):
     """Helper function to add a model to the session state and persist across pages."""
     if model_with_prefix not in st.session_state.models:
         st.session_state.models.append(model_with_prefix)
         st.session_state["models"] = list(set(st.session_state.models))  # Ensure persistence
         st.success(f"Custom model '{model_with_prefix}' saved!")
+    switch_model(model_with_prefix)
+
+def switch_model(model_with_prefix):
+    """Makes a model the selected one, loading it now and unloading the previous one if unused."""
+    st.session_state.active_model = model_with_prefix
+    get_model_manager().select(st.session_state.session_key, model_with_prefix)
 
 with tab1:
     st.markdown('<h3 style="text-align:center;">GPT Model Configuration</h3>', unsafe_allow_html=True)
@@ -75,5 +86,28 @@ with tab3:
             os.environ["DS_MODEL_NAME"] = ds_model_name
             os.environ["DS_API_KEY"] = ds_api_key
 
+st.markdown('<h3 style="text-align:center;">Loaded Models</h3>', unsafe_allow_html=True)
+manager = get_model_manager()
+manager.touch(st.session_state.session_key)
+for model_name in list(manager.states()):
+    manager.refresh(model_name)
+model_states = manager.states()
+if not model_states:
+    st.info("No models loaded yet. Models load as soon as they are selected.")
+for model_name, (state, detail) in sorted(model_states.items()):
+    name_col, state_col, action_col = st.columns([3, 2, 1])
+    name_col.markdown(f"**{model_name}**")
+    if state == READY:
+        state_col.markdown(f"🟢 ready ({detail})")
+    elif state == LOADING:
+        state_col.markdown("⏳ loading")
+    elif state == FAILED:
+        state_col.markdown(f"🔴 failed: {detail}")
+    else:
+        state_col.markdown("⚪ not loaded")
+    if action_col.button("Unload", key=f"unload_{model_name}", disabled=state == LOADING):
+        manager.unload(model_name)
+        st.rerun()
+
 if st.button("Cancel"):
     st.switch_page("locallama.py")  # Redirect to main page
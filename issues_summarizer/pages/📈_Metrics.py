@@ -0,0 +1,84 @@
+import streamlit as st
+from dotenv import load_dotenv
+import os
+
+from metrics import REGISTRY, configure_logging, serve_metrics
+from summary_cache import get_summary_cache
+
+# Page config
+st.set_page_config(
+    page_title="IssueLenz",
+    page_icon="images/github2.png",
+    layout="wide"
+)
+
+load_dotenv()
+configure_logging()
+serve_metrics()
+
+# Inject custom CSS for better styling
+st.markdown("""
+    <style>
+        .title {text-align: center; color: #2e3a59; font-size: 36px; font-weight: 600;}
+        .subtitle {text-align: center; font-size: 18px; color: #5e6a84; margin-bottom: 30px;}
+    </style>
+""", unsafe_allow_html=True)
+
+st.markdown('<div class="title">📈 Metrics</div>', unsafe_allow_html=True)
+st.markdown('<div class="subtitle">Where the time goes since this server started, across all sessions.</div>', unsafe_allow_html=True)
+
+snapshot = REGISTRY.snapshot()
+
+def total(series, name, **labels):
+    """Sum of a counter or gauge over every series matching the given labels."""
+    return sum(item["value"] for item in snapshot[series]
+               if item["name"] == name and all(item["labels"].get(k) == v for k, v in labels.items()))
+
+def timer_rows(prefix):
+    return [{"metric": item["name"], **item["labels"], "calls": item["count"],
+             "avg (s)": round(item["avg_seconds"], 3), "max (s)": round(item["max_seconds"], 3),
+             "total (s)": round(item["total_seconds"], 1)}
+            for item in snapshot["timers"] if item["name"].startswith(prefix)]
+
+cache_hits = total("counters", "summary_cache_requests_total", result="hit")
+cache_lookups = cache_hits + total("counters", "summary_cache_requests_total", result="miss")
+
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("GitHub requests", total("counters", "github_requests_total"))
+col2.metric("ETag cache hits", total("counters", "github_etag_hits_total"))
+col3.metric("LLM requests", total("counters", "llm_requests_total"))
+col4.metric("Summary cache hit rate", f"{cache_hits / cache_lookups:.0%}" if cache_lookups else "–")
+col5.metric("Tokens in / out", f"{total('counters', 'llm_prompt_tokens_total'):,} / {total('counters', 'llm_completion_tokens_total'):,}")
+
+st.subheader("🐙 GitHub")
+st.dataframe(timer_rows("github_"))
+budget = [{"token": item["labels"]["token"], "resource": item["labels"]["resource"], "remaining": item["value"]}
+          for item in snapshot["gauges"] if item["name"] == "github_rate_limit_remaining"]
+if budget:
+    st.markdown("Rate-limit budget per PAT (hashed):")
+    st.dataframe(budget)
+
+st.subheader("🤖 Models")
+st.dataframe(timer_rows("llm_") + timer_rows("summary_") + timer_rows("model_"))
+endpoints = {}
+for item in snapshot["gauges"]:
+    if item["name"] in ("llm_endpoint_outstanding", "llm_endpoint_healthy"):
+        row = endpoints.setdefault(item["labels"]["endpoint"], {"endpoint": item["labels"]["endpoint"]})
+        row["in flight" if item["name"] == "llm_endpoint_outstanding" else "healthy"] = item["value"]
+if endpoints:
+    st.markdown("Ollama / OpenAI endpoints:")
+    st.dataframe(list(endpoints.values()))
+cache_stats = get_summary_cache().stats()
+st.caption(f"Summary cache: {cache_stats['entries']} stored")
+
+st.subheader("📤 Exports")
+st.dataframe(timer_rows("export_"))
+
+with st.expander("All counters"):
+    st.dataframe([{"metric": item["name"], **item["labels"], "value": item["value"]} for item in snapshot["counters"]])
+
+if os.getenv("METRICS_PORT"):
+    st.caption(f"Prometheus endpoint: http://<host>:{os.getenv('METRICS_PORT')}/metrics")
+
+if st.button("🔄 Refresh"):
+    st.rerun()
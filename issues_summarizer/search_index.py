@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import List, NamedTuple
+
+from summarizer import issue_key, issue_repo
+from summary_cache import CACHE_DIR
+
+# How results can be ordered; "relevance" needs search text and falls back to newest without it
+SORT_ORDERS = {
+    "newest": "i.created_at DESC",
+    "oldest": "i.created_at ASC",
+    "number": "i.number DESC",
+    # FTS5 ranks are negative, better matches lower; an issue can match on its text, its summary or both
+    "relevance": "COALESCE(issue_rank.rank, 0) + COALESCE(summary_rank.rank, 0)",
+}
+
+SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+# Bumped when the tables change shape; an older index is dropped and refilled by the next fetches
+SCHEMA_VERSION = 2
+
+# The issues in scope, each with the summary cache key its summary must have been made under,
+# and that summary if it is stored
+SCOPE_JOIN = (
+    " JOIN (SELECT json_extract(value, '$[0]') AS repo, json_extract(value, '$[1]') AS number,"
+    " json_extract(value, '$[2]') AS summary_key FROM json_each(?)) scope"
+    " ON scope.repo = i.repo AND scope.number = i.number"
+    " LEFT JOIN issue_summaries s"
+    " ON s.repo = i.repo AND s.number = i.number AND s.summary_key = scope.summary_key"
+)
+RANK_JOIN = (
+    " LEFT JOIN (SELECT rowid, rank FROM issues_fts WHERE issues_fts MATCH ?) issue_rank"
+    " ON issue_rank.rowid = i.id"
+    " LEFT JOIN (SELECT rowid, rank FROM summaries_fts WHERE summaries_fts MATCH ?) summary_rank"
+    " ON summary_rank.rowid = s.id"
+)
+
+
+class SearchResults(NamedTuple):
+    """One page of matching issues and how many match in total."""
+    total: int
+    issues: List[dict]
+
+
+def fts_terms(text):
+    """Turns free text into one FTS5 query per word, each matching the word as a prefix."""
+    return [f'"{term}"*' for term in SEARCH_TERM.findall(text)]
+
+
+class SearchIndex:
+    """Full-text index over fetched issues and their summaries, for searching results locally.
+
+    Summaries are kept apart from the issues, one per summary_cache key, so jobs summarizing
+    the same issues with different models or modes each find their own. Titles, descriptions
+    and labels, and summaries, go into two FTS5 tables kept in step with their rows by triggers.
+    Without FTS5 in the local SQLite build, searches fall back to LIKE.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "search.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Every row comes from a fetch, so an index in an older layout is simply rebuilt
+            self._conn.executescript(
+                """
+                DROP TABLE IF EXISTS issues_fts;
+                DROP TABLE IF EXISTS summaries_fts;
+                DROP TABLE IF EXISTS indexed_issues;
+                DROP TABLE IF EXISTS issue_summaries;
+                """
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS indexed_issues (
+                id INTEGER PRIMARY KEY,
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                title TEXT,
+                description TEXT,
+                labels TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                url TEXT NOT NULL,
+                UNIQUE (repo, number)
+            );
+            CREATE INDEX IF NOT EXISTS indexed_issues_created ON indexed_issues (repo, created_at);
+            CREATE TABLE IF NOT EXISTS issue_summaries (
+                id INTEGER PRIMARY KEY,
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                summary_key TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                UNIQUE (repo, number, summary_key)
+            );
+            """
+        )
+        try:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5(
+                    title, description, labels, content='indexed_issues', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS indexed_issues_ai AFTER INSERT ON indexed_issues BEGIN
+                    INSERT INTO issues_fts (rowid, title, description, labels)
+                    VALUES (new.id, new.title, new.description, new.labels);
+                END;
+                CREATE TRIGGER IF NOT EXISTS indexed_issues_ad AFTER DELETE ON indexed_issues BEGIN
+                    INSERT INTO issues_fts (issues_fts, rowid, title, description, labels)
+                    VALUES ('delete', old.id, old.title, old.description, old.labels);
+                END;
+                CREATE TRIGGER IF NOT EXISTS indexed_issues_au AFTER UPDATE ON indexed_issues BEGIN
+                    INSERT INTO issues_fts (issues_fts, rowid, title, description, labels)
+                    VALUES ('delete', old.id, old.title, old.description, old.labels);
+                    INSERT INTO issues_fts (rowid, title, description, labels)
+                    VALUES (new.id, new.title, new.description, new.labels);
+                END;
+                CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+                    summary, content='issue_summaries', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS issue_summaries_ai AFTER INSERT ON issue_summaries BEGIN
+                    INSERT INTO summaries_fts (rowid, summary) VALUES (new.id, new.summary);
+                END;
+                CREATE TRIGGER IF NOT EXISTS issue_summaries_ad AFTER DELETE ON issue_summaries BEGIN
+                    INSERT INTO summaries_fts (summaries_fts, rowid, summary) VALUES ('delete', old.id, old.summary);
+                END;
+                CREATE TRIGGER IF NOT EXISTS issue_summaries_au AFTER UPDATE ON issue_summaries BEGIN
+                    INSERT INTO summaries_fts (summaries_fts, rowid, summary) VALUES ('delete', old.id, old.summary);
+                    INSERT INTO summaries_fts (rowid, summary) VALUES (new.id, new.summary);
+                END;
+                """
+            )
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+        self._conn.commit()
+
+    def add(self, issue):
+        """Indexes a formatted issue."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO indexed_issues (repo, number, title, description, labels, created_at, url)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (repo, number) DO UPDATE SET"
+                " title = excluded.title, description = excluded.description, labels = excluded.labels,"
+                " created_at = excluded.created_at, url = excluded.url",
+                (issue_repo(issue), issue["number"], issue["title"], issue["description"],
+                 json.dumps(issue["labels"]), issue["created_at"], issue["url"]),
+            )
+            self._conn.commit()
+
+    def set_summary(self, issue, summary, summary_key):
+        """Stores an issue's summary under the summary_cache key it was made with."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO issue_summaries (repo, number, summary_key, summary) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (repo, number, summary_key) DO UPDATE SET summary = excluded.summary"
+                " WHERE summary IS NOT excluded.summary",
+                (issue_repo(issue), issue["number"], summary_key, summary),
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _scope(scope, summary_keys):
+        # One JSON parameter, however many issues the scope holds
+        rows = {}
+        for issue in scope:
+            rows[issue_repo(issue), issue["number"]] = (summary_keys or {}).get(issue_key(issue))
+        return json.dumps([[repo, number, key] for (repo, number), key in rows.items()])
+
+    def search(self, scope, text="", labels=None, summarized=None, sort="newest", limit=25, offset=0,
+               summary_keys=None):
+        """Returns one page of the indexed issues matching the text and filters.
+
+        `scope` holds the formatted issues to search, e.g. the ones a fetch returned, from
+        one repository or several. `summary_keys` maps their summarizer.issue_key() to the
+        summary_cache key of the summary to show and search; issues without one have none.
+        `summarized` keeps only issues with (True) or without (False) such a summary.
+        """
+        source, params = "indexed_issues i" + SCOPE_JOIN, [self._scope(scope, summary_keys)]
+        where, where_params = " WHERE 1", []
+        for label in labels or []:
+            where += " AND EXISTS (SELECT 1 FROM json_each(i.labels) WHERE value = ?)"
+            where_params.append(label)
+        if summarized is not None:
+            where += " AND s.id IS NOT NULL" if summarized else " AND s.id IS NULL"
+
+        terms = fts_terms(text or "")
+        if terms and self.full_text:
+            # Every word has to match, in the issue's text or in its summary
+            for term in terms:
+                where += (" AND (i.id IN (SELECT rowid FROM issues_fts WHERE issues_fts MATCH ?)"
+                          " OR s.id IN (SELECT rowid FROM summaries_fts WHERE summaries_fts MATCH ?))")
+                where_params += [term, term]
+        elif terms:
+            for term in SEARCH_TERM.findall(text):
+                where += " AND (i.title || ' ' || COALESCE(i.description, '') || ' ' || i.labels || ' '"
+                where += " || COALESCE(s.summary, '')) LIKE ?"
+                where_params.append(f"%{term}%")
+        if sort == "relevance" and terms and self.full_text:
+            source += RANK_JOIN
+            params += [" OR ".join(terms)] * 2
+        elif sort == "relevance":
+            sort = "newest"
+        order = SORT_ORDERS.get(sort, SORT_ORDERS["newest"])
+        params += where_params
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT i.number, i.title, i.description, i.created_at, i.url, i.labels, s.summary"
+                f" FROM {source}{where} ORDER BY {order}, i.number DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return SearchResults(total, [
+            {"number": number, "title": title, "description": description, "created_at": created_at,
+             "url": url, "labels": json.loads(issue_labels), "summary": summary}
+            for number, title, description, created_at, url, issue_labels, summary in rows
+        ])
+
+    def labels(self, scope):
+        """Returns [(label, issue count)] over the indexed issues in scope, most used first."""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT label.value, COUNT(*) FROM indexed_issues i{SCOPE_JOIN}, json_each(i.labels) label"
+                " GROUP BY label.value ORDER BY COUNT(*) DESC, label.value",
+                [self._scope(scope, None)],
+            ).fetchall()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Returns the process-wide search index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
@@ -0,0 +1,497 @@
+import os
+import re
+import json
+import queue
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+from chunking import CHUNK_TOKENS, ISSUE_TOKEN_BUDGET, MAP_REDUCE_THRESHOLD, MAX_BLOCK_LINES
+from chunking import compact_text, count_tokens, split_into_chunks, truncate_to_budget
+from metrics import inc, observe, timed
+from models import get_model
+from summary_cache import get_summary_cache, summary_key
+
+SYSTEM_PROMPT = "You are a helpful assistant. Summarize the issue clearly and also suggest solution for it."
+PROMPT_MESSAGES = [
+    ("system", SYSTEM_PROMPT),
+    ("user", "{issues}")
+]
+CHUNK_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Below is one part of a long GitHub issue. "
+    "Summarize the facts it contains (errors, versions, steps, findings) in a few sentences."
+)
+CHUNK_PROMPT_MESSAGES = [
+    ("system", CHUNK_SYSTEM_PROMPT),
+    ("user", "{issues}")
+]
+DIGEST_SYSTEM_PROMPT = (
+    "You are a helpful assistant. The GitHub issues below report the same or a closely related problem. "
+    "Summarize the shared problem once, note anything that differs between the reports, and suggest a solution."
+)
+DIGEST_PROMPT_MESSAGES = [
+    ("system", DIGEST_SYSTEM_PROMPT),
+    ("user", "{issues}")
+]
+# Kept word for word across requests, so Ollama can reuse the cached prefix of packed prompts
+PACK_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Below are several GitHub issues, each starting with 'Issue #<number>:'. "
+    "For every issue, summarize it clearly and also suggest a solution for it. "
+    "Answer with only a JSON object whose keys are the issue numbers, as strings, and whose values "
+    "are their summaries."
+)
+PACK_PROMPT_MESSAGES = [
+    ("system", PACK_SYSTEM_PROMPT),
+    ("user", "{issues}")
+]
+# Part of every cache key, so editing the prompts or the chunking limits invalidates old summaries
+PROMPT_TEMPLATE = repr((PROMPT_MESSAGES, CHUNK_PROMPT_MESSAGES,
+                        MAP_REDUCE_THRESHOLD, CHUNK_TOKENS, ISSUE_TOKEN_BUDGET, MAX_BLOCK_LINES))
+DIGEST_TEMPLATE = repr((DIGEST_PROMPT_MESSAGES, ISSUE_TOKEN_BUDGET, MAX_BLOCK_LINES))
+PACK_TEMPLATE = repr((PACK_PROMPT_MESSAGES, ISSUE_TOKEN_BUDGET, MAX_BLOCK_LINES))
+
+# Upper bound on in-flight LLM requests (Ollama serves OLLAMA_NUM_PARALLEL of them at once)
+DEFAULT_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+# Minimum seconds between partial-summary updates per issue, so re-rendering keeps up with the tokens
+STREAM_UPDATE_INTERVAL = float(os.getenv("SUMMARY_STREAM_UPDATE_INTERVAL", "0.1"))
+# Packed mode: prompt tokens per shared request, the most issues in one, and the size above which
+# an issue is summarized on its own
+PACK_TOKEN_BUDGET = int(os.getenv("SUMMARY_PACK_TOKENS", "3000"))
+PACK_MAX_ISSUES = int(os.getenv("SUMMARY_PACK_MAX_ISSUES", "8"))
+PACK_MAX_ISSUE_TOKENS = int(os.getenv("SUMMARY_PACK_MAX_ISSUE_TOKENS", "600"))
+
+# Reasoning models such as deepseek-r1 think out loud before answering
+THINK_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+
+class SummaryResult(NamedTuple):
+    """One finished summary; `error` is set instead of `summary` when the model call failed."""
+    issue: dict
+    summary: Optional[str]
+    error: Optional[Exception]
+
+
+class SummaryProgress(NamedTuple):
+    """The summary text streamed so far for an issue that is still being summarized."""
+    issue: dict
+    partial: str
+
+
+def build_issue_text(issue):
+    """Builds the prompt text for a single formatted issue."""
+    return (
+        f"Issue #{issue['number']}: {issue['title']}\n"
+        f"Description: {issue['description']}\n"
+        f"Created At: {issue['created_at']}\n"
+        f"Labels: {', '.join(issue['labels']) if issue['labels'] else 'No label'}"
+    )
+
+
+def is_inference_client(llm):
+    """True for a huggingface_hub InferenceClient, without importing huggingface_hub just to check."""
+    hub = sys.modules.get("huggingface_hub")
+    return hub is not None and isinstance(llm, hub.InferenceClient)
+
+
+def build_chain(llm, messages=PROMPT_MESSAGES):
+    """Builds the LangChain summary chain for a LangChain LLM."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    prompt = ChatPromptTemplate.from_messages(messages)
+    return prompt | llm | StrOutputParser()
+
+
+def model_label(llm):
+    """Model name for metric labels, whichever backend client this is."""
+    for attribute in ("model", "model_name", "name"):
+        value = getattr(llm, attribute, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(llm).__name__
+
+
+@contextmanager
+def llm_call(llm, kind, prompt):
+    """Times one model call and counts its tokens in and out; store the output in call["completion"]."""
+    labels = {"model": model_label(llm), "kind": kind}
+    call = {"completion": ""}
+    with timed("llm_request_seconds", **labels):
+        yield call
+    inc("llm_requests_total", **labels)
+    inc("llm_prompt_tokens_total", count_tokens(prompt), **labels)
+    inc("llm_completion_tokens_total", count_tokens(call["completion"]), **labels)
+
+
+def complete(llm, messages, text, kind, max_new_tokens=200):
+    """One blocking model call with the given prompt messages."""
+    with llm_call(llm, kind, text) as call:
+        if is_inference_client(llm):
+            # The per-issue prompt has always gone to text_generation without its system message
+            prompt = text if messages is PROMPT_MESSAGES else f"{messages[0][1]}\n\n{text}"
+            call["completion"] = llm.text_generation(prompt, max_new_tokens=max_new_tokens).strip()
+        else:
+            call["completion"] = build_chain(llm, messages).invoke({"issues": text}).strip()
+    return call["completion"]
+
+
+def issue_repo(issue):
+    """Returns the owner/repo part of a formatted issue's URL."""
+    return issue["url"].split("/issues/")[0].replace("https://github.com/", "")
+
+
+def issue_key(issue):
+    """Identifies a formatted issue across repositories, where issue numbers repeat."""
+    return issue["url"]
+
+
+def issue_cache_key(issue, model_name):
+    return summary_key(issue_repo(issue), model_name, PROMPT_TEMPLATE, build_issue_text(issue))
+
+
+def summarize_chunk(llm, chunk):
+    """Summarizes one part of a long issue body (the map step)."""
+    return complete(llm, CHUNK_PROMPT_MESSAGES, chunk, "chunk")
+
+
+def prepare_description(llm, description):
+    """Fits an issue body into the prompt budget.
+
+    Repeated log lines and code blocks are collapsed, the rest is capped at ISSUE_TOKEN_BUDGET,
+    and bodies still over MAP_REDUCE_THRESHOLD are summarized chunk by chunk so the final prompt
+    only carries the chunk summaries.
+    """
+    description = truncate_to_budget(compact_text(description or ""))
+    if count_tokens(description) <= MAP_REDUCE_THRESHOLD:
+        return description
+
+    # Chunks run one after another: issues are already summarized in parallel, and nesting
+    # another fan-out here would overshoot the number of requests Ollama serves at once
+    parts = [summarize_chunk(llm, chunk) for chunk in split_into_chunks(description)]
+    return "\n".join(f"(Part {i} summary) {part}" for i, part in enumerate(parts, 1))
+
+
+def summarize_issue(llm, issue):
+    """Summarizes one issue with blocking LLM calls, map-reducing very long bodies."""
+    issue_text_str = build_issue_text({**issue, "description": prepare_description(llm, issue["description"])})
+    return complete(llm, PROMPT_MESSAGES, issue_text_str, "summary")
+
+
+def stream_issue(llm, issue):
+    """Summarizes one issue, yielding the summary text piece by piece as the model produces it."""
+    issue_text_str = build_issue_text({**issue, "description": prepare_description(llm, issue["description"])})
+    with llm_call(llm, "summary", issue_text_str) as call:
+        started = time.perf_counter()
+        if is_inference_client(llm):
+            pieces = llm.text_generation(issue_text_str, max_new_tokens=200, stream=True)
+        else:
+            pieces = build_chain(llm).stream({"issues": issue_text_str})
+        streamed = []
+        for piece in pieces:
+            if not streamed:
+                observe("llm_first_token_seconds", time.perf_counter() - started, model=model_label(llm))
+            streamed.append(piece)
+            yield piece
+        call["completion"] = "".join(streamed)
+
+
+def summarize_issue_streaming(llm, issue, on_text, cache=None, model_name=None):
+    """Summarizes one issue, passing the text so far to `on_text` as it grows.
+
+    A cached summary is returned without calling `on_text`; a fresh one is stored once complete.
+    """
+    key = issue_cache_key(issue, model_name) if cache is not None else None
+    if key is not None:
+        summary = cache.get(key)
+        inc("summary_cache_requests_total", result="miss" if summary is None else "hit")
+        if summary is not None:
+            return summary
+
+    pieces = []
+    last_update = 0
+    with timed("summary_seconds", model=model_name or model_label(llm)):
+        for piece in stream_issue(llm, issue):
+            pieces.append(piece)
+            now = time.monotonic()
+            if now - last_update >= STREAM_UPDATE_INTERVAL:
+                on_text("".join(pieces))
+                last_update = now
+
+    summary = "".join(pieces).strip()
+    if key is not None:
+        cache.set(key, summary)
+    return summary
+
+
+def summarize_issue_cached(llm, issue, cache, model_name):
+    """Returns the cached summary for an issue, summarizing and storing it on a miss."""
+    key = issue_cache_key(issue, model_name)
+    summary = cache.get(key)
+    inc("summary_cache_requests_total", result="miss" if summary is None else "hit")
+    if summary is None:
+        with timed("summary_seconds", model=model_name):
+            summary = summarize_issue(llm, issue)
+        cache.set(key, summary)
+    return summary
+
+
+def get_summary(issue, model_name, cache=None):
+    """Summarizes a single formatted issue with the named model, reusing the summary cache."""
+    cache = cache if cache is not None else get_summary_cache()
+    return summarize_issue_cached(get_model(model_name), issue, cache, model_name)
+
+
+def build_cluster_text(cluster):
+    """Builds the digest prompt text for a cluster, splitting the token budget across its members."""
+    budget = max(ISSUE_TOKEN_BUDGET // len(cluster.issues), 200)
+    return "\n\n".join(
+        build_issue_text({**issue, "description": truncate_to_budget(compact_text(issue["description"] or ""), budget)})
+        for issue in cluster.issues
+    )
+
+
+def summarize_cluster(llm, cluster):
+    """Summarizes a cluster of near-duplicate issues with one LLM call."""
+    if len(cluster.issues) == 1:
+        return summarize_issue(llm, cluster.issues[0])
+    return complete(llm, DIGEST_PROMPT_MESSAGES, build_cluster_text(cluster), "digest", max_new_tokens=300)
+
+
+def cluster_cache_key(cluster, model_name):
+    if len(cluster.issues) == 1:
+        return issue_cache_key(cluster.issues[0], model_name)
+    return summary_key(issue_repo(cluster.issues[0]), model_name, DIGEST_TEMPLATE, build_cluster_text(cluster))
+
+
+def summarize_cluster_cached(llm, cluster, cache, model_name):
+    """Returns the cached digest summary for a cluster, summarizing and storing it on a miss."""
+    key = cluster_cache_key(cluster, model_name)
+    summary = cache.get(key)
+    inc("summary_cache_requests_total", result="miss" if summary is None else "hit")
+    if summary is None:
+        summary = summarize_cluster(llm, cluster)
+        cache.set(key, summary)
+    return summary
+
+
+def packed_issue_text(issue):
+    """Prompt text for an issue inside a packed request; long bodies are compacted, never map-reduced."""
+    return build_issue_text({**issue, "description": truncate_to_budget(compact_text(issue["description"] or ""))})
+
+
+def pack_issues(issues, budget=PACK_TOKEN_BUDGET, max_issues=PACK_MAX_ISSUES):
+    """Groups issues into lists that fit one packed request, reading `issues` lazily.
+
+    Issues over PACK_MAX_ISSUE_TOKENS come out as lists of one, to be summarized on their own.
+    """
+    pack, used = [], 0
+    for issue in issues:
+        tokens = count_tokens(packed_issue_text(issue))
+        if tokens > PACK_MAX_ISSUE_TOKENS:
+            yield [issue]
+            continue
+        # Answers are keyed by issue number, which repeats across repositories
+        duplicate = any(packed["number"] == issue["number"] for packed in pack)
+        if pack and (used + tokens > budget or len(pack) >= max_issues or duplicate):
+            yield pack
+            pack, used = [], 0
+        pack.append(issue)
+        used += tokens
+    if pack:
+        yield pack
+
+
+def parse_packed_summaries(text, numbers):
+    """Returns {number: summary} for the issues a packed answer covers; anything unparseable is left out."""
+    text = THINK_BLOCK.sub("", text)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return {}
+    try:
+        payload = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(payload, dict):
+        return {}
+    summaries = {}
+    for number in numbers:
+        summary = payload.get(str(number))
+        if isinstance(summary, str) and summary.strip():
+            summaries[number] = summary.strip()
+    return summaries
+
+
+def summarize_pack(llm, issues):
+    """Summarizes several short issues with one LLM call, returning ({number: summary}, {number: error}).
+
+    Issues the answer leaves out, or that don't parse, are summarized one by one instead; one of
+    those failing leaves the others' summaries in place.
+    """
+    if len(issues) == 1:
+        return {issues[0]["number"]: summarize_issue(llm, issues[0])}, {}
+
+    text = "\n\n".join(packed_issue_text(issue) for issue in issues)
+    answer = complete(llm, PACK_PROMPT_MESSAGES, text, "packed", max_new_tokens=200 * len(issues))
+    summaries = parse_packed_summaries(answer, [issue["number"] for issue in issues])
+    inc("summary_packed_issues_total", len(summaries), model=model_label(llm))
+    errors = {}
+    for issue in issues:
+        if issue["number"] not in summaries:
+            inc("summary_pack_fallbacks_total", model=model_label(llm))
+            try:
+                summaries[issue["number"]] = summarize_issue(llm, issue)
+            except Exception as e:
+                errors[issue["number"]] = e
+    return summaries, errors
+
+
+def pack_cache_key(issue, model_name):
+    return summary_key(issue_repo(issue), model_name, PACK_TEMPLATE, packed_issue_text(issue))
+
+
+def cached_pack_summary(issue, cache, model_name):
+    """A cached summary for the issue, from either a single or a packed request."""
+    summary = cache.get(issue_cache_key(issue, model_name), pack_cache_key(issue, model_name))
+    inc("summary_cache_requests_total", result="miss" if summary is None else "hit")
+    return summary
+
+
+def summarize_pack_cached(llm, issues, cache, model_name):
+    """Summarizes a pack, storing each summary under the key of the kind of request that produced it."""
+    with timed("summary_seconds", model=model_name, kind="packed"):
+        summaries, errors = summarize_pack(llm, issues)
+    for issue in issues:
+        if issue["number"] not in summaries:
+            continue
+        single = len(issues) == 1
+        key = issue_cache_key(issue, model_name) if single else pack_cache_key(issue, model_name)
+        cache.set(key, summaries[issue["number"]])
+    return summaries, errors
+
+
+def map_as_completed(func, items, max_workers, updates=None):
+    """Runs func over items in a thread pool and yields (item, result, error) as each completes.
+
+    `items` may be any iterable, including a generator still fetching from GitHub: it is only
+    read far enough ahead to keep `max_workers` calls in flight, so memory stays bounded.
+    When `updates` is a queue, whatever the workers put on it is yielded in between.
+    """
+    items = iter(items)
+    in_flight = {}
+    # Same fan-out LangChain's batch_as_completed() uses, but fed lazily instead of from a list
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def fill():
+        while len(in_flight) < max_workers * 2:
+            item = next(items, None)
+            if item is None:
+                return
+            in_flight[pool.submit(func, item)] = item
+
+    try:
+        fill()
+        while in_flight:
+            # With an updates queue, wake up regularly to pass on progress from running calls
+            timeout = STREAM_UPDATE_INTERVAL if updates is not None else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if updates is not None:
+                yield from drain(updates)
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+            fill()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def drain(updates):
+    """Empties an updates queue without blocking."""
+    while True:
+        try:
+            yield updates.get_nowait()
+        except queue.Empty:
+            return
+
+
+def summarize_issues(llm, issues, max_workers=DEFAULT_MAX_WORKERS, cache=None, model_name=None):
+    """Summarizes issues concurrently and yields a SummaryResult as each one completes.
+
+    The first summary is ready after the first page of a streaming fetch. Cache hits finish
+    almost immediately.
+    """
+    if cache is None:
+        def summarize(issue):
+            return summarize_issue(llm, issue)
+    else:
+        def summarize(issue):
+            return summarize_issue_cached(llm, issue, cache, model_name)
+
+    for issue, summary, error in map_as_completed(summarize, issues, max_workers):
+        yield SummaryResult(issue, summary, error)
+
+
+def stream_summaries(llm, issues, max_workers=DEFAULT_MAX_WORKERS, cache=None, model_name=None):
+    """Like summarize_issues(), but also yields a SummaryProgress with the partial text of
+    issues still being summarized, so the first tokens can be shown as soon as they arrive."""
+    updates = queue.Queue()
+
+    def summarize(issue):
+        return summarize_issue_streaming(llm, issue, lambda text: updates.put(SummaryProgress(issue, text)),
+                                         cache, model_name)
+
+    for event in map_as_completed(summarize, issues, max_workers, updates):
+        if isinstance(event, SummaryProgress):
+            yield event
+        else:
+            yield SummaryResult(*event)
+
+
+def summarize_clusters(llm, clusters, max_workers=DEFAULT_MAX_WORKERS, cache=None, model_name=None):
+    """Summarizes issue clusters concurrently, one LLM call per cluster, yielding
+    (cluster, summary, error) as each one completes."""
+    if cache is None:
+        def summarize(cluster):
+            return summarize_cluster(llm, cluster)
+    else:
+        def summarize(cluster):
+            return summarize_cluster_cached(llm, cluster, cache, model_name)
+
+    yield from map_as_completed(summarize, clusters, max_workers)
+
+
+def summarize_issues_packed(llm, issues, max_workers=DEFAULT_MAX_WORKERS, cache=None, model_name=None):
+    """Like summarize_issues(), but short issues share requests, so small local models spend less
+    time on per-request overhead and prompt prefill.
+
+    Cache hits are yielded right away and never sent to the model.
+    """
+    hits = []
+
+    def uncached():
+        for issue in issues:
+            summary = cached_pack_summary(issue, cache, model_name) if cache is not None else None
+            if summary is None:
+                yield issue
+            else:
+                hits.append(SummaryResult(issue, summary, None))
+
+    if cache is None:
+        def summarize(pack):
+            return summarize_pack(llm, pack)
+    else:
+        def summarize(pack):
+            return summarize_pack_cached(llm, pack, cache, model_name)
+
+    for pack, result, error in map_as_completed(summarize, pack_issues(uncached()), max_workers):
+        # Hits found while filling the pool are passed on between packs
+        while hits:
+            yield hits.pop(0)
+        summaries, errors = result if error is None else ({}, {})
+        for issue in pack:
+            yield SummaryResult(issue, summaries.get(issue["number"]), error or errors.get(issue["number"]))
+    yield from hits
@@ -0,0 +1,123 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.getenv("ISSUELENZ_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "issuelenz"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "50000"))
+DEFAULT_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Long-running processes open the cache once, so also purge expired rows every this many writes
+PURGE_EVERY_WRITES = 1000
+
+
+def normalize_text(text):
+    """Normalizes line endings and trailing whitespace so cosmetic edits don't change the key."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def summary_key(repo, model_name, prompt_template, issue_text):
+    """Content-addressed cache key for one summary."""
+    digest = hashlib.sha256()
+    for part in (repo, model_name, prompt_template, normalize_text(issue_text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """SQLite-backed summary store with LRU and TTL eviction."""
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "summaries.sqlite3")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # Summaries are written from worker threads, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+        self.purge_expired()
+
+    def get(self, *keys):
+        """Returns the cached summary for the first of `keys` that has one, or None on a miss.
+
+        Several keys are one lookup, e.g. a summary that either kind of request may have made,
+        and count as a single hit or miss.
+        """
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute("SELECT summary, created_at FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    self._conn.commit()
+                    row = None
+                if row is not None:
+                    self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, key, summary):
+        """Stores a summary and evicts the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, now, now),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM summaries WHERE key IN ("
+                    " SELECT key FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY_WRITES == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Deletes every entry older than the TTL."""
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """Returns the process-wide summary cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SummaryCache()
+        return _cache
@@ -1,18 +1,21 @@
 #!/bin/bash
 
-# Ensure the app waits for Ollama to be available
-echo "Waiting for Ollama to start..."
-until curl -s http://ollama:11434/api/tags | grep -q 'models'; do
-  sleep 2
-done
+# Ensure the app waits for every Ollama node to be available
+OLLAMA_URLS="${OLLAMA_URLS:-http://ollama:11434}"
+for url in ${OLLAMA_URLS//,/ }; do
+  echo "Waiting for Ollama at $url..."
+  until curl -s "$url/api/tags" | grep -q 'models'; do
+    sleep 2
+  done
 
-echo "Ollama is up! Checking available models..."
+  echo "Ollama at $url is up! Checking available models..."
 
-# Auto-pull the model if none exist
-if [ "$(curl -s http://ollama:11434/api/tags)" = '{"models":[]}' ]; then
-  echo "No models found. Pulling deepseek-r1:1.5b..."
-  ollama pull deepseek-r1:1.5b
-fi
+  # Auto-pull the model if none exist
+  if [ "$(curl -s "$url/api/tags")" = '{"models":[]}' ]; then
+    echo "No models found. Pulling deepseek-r1:1.5b..."
+    curl -s "$url/api/pull" -d '{"name": "deepseek-r1:1.5b"}' > /dev/null
+  fi
+done
 
 # Start the Streamlit app
 streamlit run /app/issues_summarizer/locallama.py --server.port 8501 --server.address 0.0.0.0